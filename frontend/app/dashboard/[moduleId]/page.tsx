@@ -37,6 +37,7 @@ export default function ModuleDetails({ params }: { params: Promise<{ moduleId:
   const [studentsData, setStudentsData] = useState<any[]>([]);
   const [embeddingProgress, setEmbeddingProgress] = useState(false);
   const [embedStatus, setEmbedStatus] = useState<string>("");
+  const [embedJobId, setEmbedJobId] = useState<string | null>(null);
 
   const router = useRouter();
 
@@ -79,7 +80,7 @@ export default function ModuleDetails({ params }: { params: Promise<{ moduleId:
       }).filter(id => id && id !== 'undefined');
 
       // 2. Check with Python service
-      const checkResult = await pythonService.checkStudents(studentIds);
+      const checkResult = await pythonService.checkStudents(studentIds, selectedClass);
 
       if (checkResult.missing && checkResult.missing.length > 0) {
         setMissingIds(checkResult.missing);
@@ -142,7 +143,17 @@ export default function ModuleDetails({ params }: { params: Promise<{ moduleId:
 
       console.log("Final payload for embedding:", payload);
 
-      const result = await pythonService.embedStudents(payload);
+      const result = await pythonService.embedStudents(
+        payload,
+        (progress) => setEmbedStatus(`Embedding students... ${progress.processed}/${progress.total}`),
+        (jobId) => setEmbedJobId(jobId)
+      );
+      setEmbedJobId(null);
+
+      if (result.status === 'cancelled') {
+        setEmbedStatus(`Cancelled. Success: ${result.success.length}, Failed: ${result.failed.length}`);
+        return;
+      }
 
       setEmbedStatus(`Done! Success: ${result.success.length}, Failed: ${result.failed.length}`);
 
@@ -154,11 +165,22 @@ export default function ModuleDetails({ params }: { params: Promise<{ moduleId:
     } catch (error) {
       console.error("Embedding error:", error);
       setEmbedStatus("Error during embedding.");
+      setEmbedJobId(null);
     } finally {
       setEmbeddingProgress(false); // keep modal open to show status
     }
   };
 
+  const cancelEmbedding = async () => {
+    if (!embedJobId) return;
+    try {
+      await pythonService.cancelEmbedJob(embedJobId);
+      setEmbedStatus("Cancelling...");
+    } catch (error) {
+      console.error("Failed to cancel embedding:", error);
+    }
+  };
+
   const skipEmbedding = () => {
     router.push(`/session/${selectedSlot!}/${selectedClass!}`);
   };
@@ -194,6 +216,15 @@ export default function ModuleDetails({ params }: { params: Promise<{ moduleId:
                 Skip & Start
               </button>
 
+              {embedJobId && (
+                <button
+                  onClick={cancelEmbedding}
+                  className="px-4 py-2 text-red-600 hover:bg-red-50 rounded-lg font-medium"
+                >
+                  Cancel
+                </button>
+              )}
+
               <button
                 onClick={handleEmbedAll}
                 disabled={embeddingProgress}
@@ -2,7 +2,7 @@
 
 import { useEffect, useState, use, useRef, useCallback } from 'react';
 import { useRouter } from 'next/navigation';
-import { attendanceService } from '@/lib/api';
+import { attendanceService, pythonService, PresenceEvent } from '@/lib/api';
 import { ArrowLeft, RefreshCw, CheckCircle, XCircle, UserCheck, UserX, Loader2, Play, Pause, Square, Video, VideoOff, Maximize, Minimize, Scan, ScanLine, Users, Camera, Settings, RotateCcw, Search, Filter, ZoomIn, ZoomOut, RotateCw, Move, Target, ChevronUp, ChevronDown, ChevronLeft, ChevronRight, Home, Gamepad2 } from 'lucide-react';
 
 interface Student {
@@ -13,13 +13,6 @@ interface Student {
   faceEmbedders: string;
 }
 
-interface DetectionResult {
-  student_id: string;
-  name: string;
-  confidence: number;
-  bbox: { top: number; right: number; bottom: number; left: number };
-}
-
 export default function LiveSession({ params }: { params: Promise<{ guidId: string; classId: string }> }) {
   const { guidId, classId } = use(params);
   const router = useRouter();
@@ -54,7 +47,9 @@ export default function LiveSession({ params }: { params: Promise<{ guidId: stri
 
   // Track which students we've already sent attendance for (to avoid duplicates)
   const attendedStudentsRef = useRef<Set<string>>(new Set());
-  const pollingIntervalRef = useRef<NodeJS.Timeout | null>(null);
+  const rosterRegisteredRef = useRef(false);
+  // Threshold sent with the roster registration (read when it happens)
+  const detectionThresholdRef = useRef(detectionThreshold);
 
   // Poll patrol status every 2 seconds
   useEffect(() => {
@@ -78,6 +73,19 @@ export default function LiveSession({ params }: { params: Promise<{ guidId: stri
           attendedStudentsRef.current.add(s.userId);
         }
       });
+
+      // Scope recognition to this class roster (once per session)
+      if (!rosterRegisteredRef.current && studentList.length > 0) {
+        rosterRegisteredRef.current = true;
+        pythonService.registerSession(
+          studentList.map((s: Student) => String(s.userId)),
+          parseInt(classId),
+          detectionThresholdRef.current / 100
+        ).catch((error) => {
+          rosterRegisteredRef.current = false;
+          console.error('Failed to register session roster:', error);
+        });
+      }
     } catch (error) {
       console.error('Error fetching students:', error);
     } finally {
@@ -103,50 +111,82 @@ export default function LiveSession({ params }: { params: Promise<{ guidId: stri
     }
   };
 
-  // Poll for face detections and auto-record attendance
-  const pollDetections = useCallback(async () => {
-    if (!cameraActive || !autoDetection) return;
+  // The service applies the threshold when voting, so confirmed events are recorded as they are
+  useEffect(() => {
+    detectionThresholdRef.current = detectionThreshold;
+    if (!rosterRegisteredRef.current) return;
+    // Debounced: the slider fires on every step while dragging
+    const timeout = setTimeout(() => {
+      pythonService.updateSessionThreshold(detectionThreshold / 100).catch((error) => {
+        console.error('Failed to update session threshold:', error);
+      });
+    }, 300);
+    return () => clearTimeout(timeout);
+  }, [detectionThreshold]);
+
+  // Record one student confirmed present by the service (it already required several matches)
+  const recordPresence = useCallback(async (event: PresenceEvent): Promise<boolean> => {
+    const studentId = event.student_id;
+    const confidence = event.confidence * 100; // Convert to percentage
+    if (attendedStudentsRef.current.has(studentId)) return true;
 
+    console.log(`Recording attendance for ${studentId} with ${confidence.toFixed(0)}% confidence (${event.hits} matches)`);
     try {
-      const response = await fetch('http://localhost:5000/detect', { method: 'POST' });
-      const data = await response.json();
-
-      if (data.results && data.results.length > 0) {
-        setDetectedCount(data.results.length);
-
-        // Process each detected face
-        for (const result of data.results as DetectionResult[]) {
-          const studentId = result.student_id;
-          const confidence = result.confidence * 100; // Convert to percentage
-
-          // If confidence > threshold and we haven't already recorded this student
-          if (confidence > detectionThreshold && studentId && !attendedStudentsRef.current.has(studentId)) {
-            console.log(`Recording attendance for ${studentId} with ${confidence.toFixed(0)}% confidence`);
-
-            try {
-              await attendanceService.recordAttendance(
-                parseInt(classId),
-                studentId,
-                Math.round(confidence)
-              );
-
-              // Add to our tracking set
-              attendedStudentsRef.current.add(studentId);
-
-              // Fetch fresh data from API
-              await fetchStudents();
-            } catch (error) {
-              console.error(`Failed to record attendance for ${studentId}:`, error);
-            }
-          }
-        }
-      } else {
-        setDetectedCount(0);
-      }
+      await attendanceService.recordAttendance(
+        parseInt(classId),
+        studentId,
+        Math.round(confidence)
+      );
+
+      // Add to our tracking set
+      attendedStudentsRef.current.add(studentId);
+
+      // Fetch fresh data from API
+      await fetchStudents();
+      return true;
     } catch (error) {
-      // Detection endpoint might not be available, ignore
+      console.error(`Failed to record attendance for ${studentId}:`, error);
+      return false;
+    }
+  }, [classId, fetchStudents]);
+
+  // Latest recordPresence for the long-lived event subscription
+  const recordPresenceRef = useRef(recordPresence);
+  useEffect(() => {
+    recordPresenceRef.current = recordPresence;
+  }, [recordPresence]);
+
+  // Face counts and confirmed presence events are pushed by the service as they happen
+  useEffect(() => {
+    if (!cameraActive || !autoDetection) {
+      setDetectedCount(0);
+      return;
     }
-  }, [cameraActive, autoDetection, detectionThreshold, classId, fetchStudents]);
+
+    // Record presence events one at a time, in order; a failed one is retried on the next event
+    const pending: PresenceEvent[] = [];
+    let draining = false;
+    const drain = async () => {
+      if (draining) return;
+      draining = true;
+      while (pending.length > 0) {
+        if (!(await recordPresenceRef.current(pending[0]))) break;
+        pending.shift();
+      }
+      draining = false;
+    };
+
+    return pythonService.subscribeEvents({
+      onDetection: (event) => {
+        setDetectedCount(event.results.length);
+        drain();
+      },
+      onPresent: (event) => {
+        pending.push(event);
+        drain();
+      }
+    });
+  }, [cameraActive, autoDetection]);
 
   // Handle manual attendance toggle
   const handleManualAttendance = async (studentId: string, markPresent: boolean) => {
@@ -376,13 +416,19 @@ export default function LiveSession({ params }: { params: Promise<{ guidId: stri
     }
   };
 
+  // Go back to full-gallery matching when leaving the session
+  useEffect(() => {
+    return () => {
+      pythonService.clearSession().catch(() => {
+        // Python service may not be available, ignore
+      });
+    };
+  }, []);
+
   useEffect(() => {
     fetchStudents();
     startCamera();
 
-    // Start polling for detections every 2 seconds
-    pollingIntervalRef.current = setInterval(pollDetections, 2000);
-
     // Auto-start patrol if enabled (only once on mount)
     if (autoPatrol) {
       const patrolTimer = setTimeout(() => {
@@ -391,17 +437,11 @@ export default function LiveSession({ params }: { params: Promise<{ guidId: stri
 
       return () => {
         clearTimeout(patrolTimer);
-        if (pollingIntervalRef.current) {
-          clearInterval(pollingIntervalRef.current);
-        }
         stopPatrol();
       };
     }
 
     return () => {
-      if (pollingIntervalRef.current) {
-        clearInterval(pollingIntervalRef.current);
-      }
       stopPatrol();
     };
   }, []); // Empty dependency array - only run once on mount
@@ -420,9 +460,6 @@ export default function LiveSession({ params }: { params: Promise<{ guidId: stri
             onClick={() => {
               stopCamera();
               stopPatrol();
-              if (pollingIntervalRef.current) {
-                clearInterval(pollingIntervalRef.current);
-              }
               router.back();
             }}
             className="p-2 hover:bg-gray-100 rounded-full transition-colors"
@@ -769,9 +806,6 @@ export default function LiveSession({ params }: { params: Promise<{ guidId: stri
             <button
               onClick={() => {
                 stopCamera();
-                if (pollingIntervalRef.current) {
-                  clearInterval(pollingIntervalRef.current);
-                }
                 router.back();
               }}
               className="p-3 rounded-full bg-red-600 hover:bg-red-500 text-white transition-all"
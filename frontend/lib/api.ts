@@ -147,19 +147,145 @@ export const attendanceService = {
   }
 };
 
+const PYTHON_BASE_URL = 'http://localhost:5000';
+
 const pythonApi = axios.create({
-  baseURL: 'http://localhost:5000',
-  timeout: 300000 // 5 minutes for embedding
+  baseURL: PYTHON_BASE_URL,
+  timeout: 30000
 });
 
+export interface EmbedProgress {
+  seq: number;
+  id: string;
+  status: 'success' | 'failed' | 'cancelled';
+  reason: string | null;
+  processed: number;
+  total: number;
+}
+
+export interface EmbedJobSummary {
+  job_id: string;
+  status: 'queued' | 'running' | 'completed' | 'cancelled' | 'failed';
+  error: string | null;
+  total: number;
+  processed: number;
+  success: string[];
+  failed: { id: string; reason: string | null }[];
+}
+
+export interface PresenceEvent {
+  seq: number;
+  session_id: string;
+  student_id: string;
+  name: string;
+  confidence: number;
+  hits: number;
+  camera_id: string;
+  timestamp: string;
+  confirmed_at: string;
+}
+
+export interface DetectionEvent {
+  camera_id: string;
+  timestamp: string;
+  seq: number;
+  frame_seq: number;
+  results: {
+    student_id: string | null;
+    name: string;
+    confidence: number;
+    track_id?: number;
+    fresh?: boolean;
+    bbox: { top: number; right: number; bottom: number; left: number };
+  }[];
+}
+
+// Sessions run per camera (room); the unscoped path is the default camera's
+const sessionPath = (cameraId?: string) =>
+  cameraId ? `/cameras/${encodeURIComponent(cameraId)}/session` : '/session';
+
 export const pythonService = {
-  checkStudents: async (studentIds: string[]) => {
-    const response = await pythonApi.post('/check-students', { student_ids: studentIds });
+  checkStudents: async (studentIds: string[], classId?: number) => {
+    const response = await pythonApi.post('/check-students', { student_ids: studentIds, class_id: classId });
+    return response.data;
+  },
+
+  // Restrict a camera's live recognition to the students of this class (default camera if omitted);
+  // minConfidence (0-1) is the match confidence that counts as a vote
+  registerSession: async (studentIds: string[], classId: number, minConfidence?: number, cameraId?: string) => {
+    const response = await pythonApi.post(sessionPath(cameraId), {
+      student_ids: studentIds,
+      class_id: classId,
+      min_confidence: minConfidence
+    });
+    return response.data;
+  },
+
+  // Change the vote threshold of a camera's running session
+  updateSessionThreshold: async (minConfidence: number, cameraId?: string) => {
+    const response = await pythonApi.patch(sessionPath(cameraId), { min_confidence: minConfidence });
+    return response.data;
+  },
+
+  clearSession: async (cameraId?: string) => {
+    const response = await pythonApi.delete(sessionPath(cameraId));
     return response.data;
   },
 
-  embedStudents: async (students: { studentId: string; fullName: string }[]) => {
+  // Follows recognition results and confirmed presence events pushed by the service; returns an unsubscribe function
+  subscribeEvents: (
+    handlers: { onDetection?: (event: DetectionEvent) => void; onPresent?: (event: PresenceEvent) => void },
+    cameraId?: string
+  ): (() => void) => {
+    const path = cameraId ? `/cameras/${encodeURIComponent(cameraId)}/events` : '/events';
+    // EventSource reconnects on its own and resumes presence events from Last-Event-ID;
+    // detection events missed while disconnected are not replayed (the next one is the latest result)
+    const source = new EventSource(`${PYTHON_BASE_URL}${path}`);
+
+    source.addEventListener('detection', (event) => {
+      handlers.onDetection?.(JSON.parse((event as MessageEvent).data));
+    });
+
+    source.addEventListener('present', (event) => {
+      handlers.onPresent?.(JSON.parse((event as MessageEvent).data));
+    });
+
+    return () => source.close();
+  },
+
+  // Submits an enrollment job and follows its progress stream until it finishes
+  embedStudents: async (
+    students: { studentId: string; fullName: string }[],
+    onProgress?: (progress: EmbedProgress) => void,
+    onJobCreated?: (jobId: string) => void
+  ): Promise<EmbedJobSummary> => {
     const response = await pythonApi.post('/embed-students', { students });
+    const jobId: string = response.data.job_id;
+    onJobCreated?.(jobId);
+
+    return new Promise((resolve, reject) => {
+      const source = new EventSource(`${PYTHON_BASE_URL}/embed-students/${jobId}/stream`);
+
+      source.addEventListener('progress', (event) => {
+        onProgress?.(JSON.parse((event as MessageEvent).data));
+      });
+
+      source.addEventListener('done', (event) => {
+        source.close();
+        resolve(JSON.parse((event as MessageEvent).data));
+      });
+
+      source.onerror = () => {
+        // EventSource reconnects (resuming from Last-Event-ID) unless the server is gone
+        if (source.readyState === EventSource.CLOSED) {
+          reject(new Error(`Lost progress stream for enrollment job ${jobId}`));
+        }
+      };
+    });
+  },
+
+  cancelEmbedJob: async (jobId: string) => {
+    const response = await pythonApi.delete(`/embed-students/${jobId}`);
     return response.data;
   }
 };
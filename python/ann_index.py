@@ -0,0 +1,201 @@
+"""
+Approximate nearest-neighbour index for large face galleries
+Pure-NumPy IVF (inverted file) index: k-means coarse centroids partition the
+gallery into lists, and a query only scans the rows of its closest lists
+"""
+import numpy as np
+from typing import List, Optional, Tuple
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Lloyd's k-means on float32 rows
+
+    Args:
+        data: (N, D) float32 matrix
+        k: Number of centroids
+        iterations: Number of assignment/update rounds
+        seed: Random seed for centroid initialization
+
+    Returns:
+        (k, D) float32 centroid matrix
+    """
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, len(data)))
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    data_sq = np.einsum('ij,ij->i', data, data)
+
+    for _ in range(iterations):
+        assign = nearest_centroids(data, centroids, data_sq)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        nonempty = counts > 0
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        # Re-seed empty clusters from random rows so every list stays useful
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), size=len(empty))]
+
+    return centroids
+
+
+def nearest_centroids(data: np.ndarray, centroids: np.ndarray, data_sq: Optional[np.ndarray] = None) -> np.ndarray:
+    """Index of the closest centroid for each row"""
+    if data_sq is None:
+        data_sq = np.einsum('ij,ij->i', data, data)
+    centroid_sq = np.einsum('ij,ij->i', centroids, centroids)
+    sq = data_sq[:, None] + centroid_sq[None, :] - 2.0 * (data @ centroids.T)
+    return np.argmin(sq, axis=1)
+
+
+class IVFIndex:
+    """Inverted-file index over the rows of a gallery matrix"""
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8, iterations: int = 10):
+        """
+        Initialize index
+
+        Args:
+            nlist: Number of coarse centroids (0 = about sqrt(N))
+            nprobe: Number of lists scanned per query; higher = better recall, slower
+            iterations: k-means iterations used when training
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.centroids: Optional[np.ndarray] = None
+        # Per list: gallery row numbers plus a contiguous copy of their vectors and squared norms
+        self.lists: List[np.ndarray] = []
+        self.list_vectors: List[np.ndarray] = []
+        self.list_sq_norms: List[np.ndarray] = []
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.trained_size = 0
+
+    def build(self, matrix: np.ndarray):
+        """
+        Train centroids and fill lists from a gallery matrix
+
+        Args:
+            matrix: (N, 128) float32 gallery rows
+        """
+        size = len(matrix)
+        self.lists, self.list_vectors, self.list_sq_norms = [], [], []
+        if size == 0:
+            self.centroids = None
+            self.assignments = np.zeros(0, dtype=np.int32)
+            self.trained_size = 0
+            return
+        nlist = self.nlist or int(np.sqrt(size))
+        self.centroids = kmeans(matrix, nlist, self.iterations)
+        self.assignments = nearest_centroids(matrix, self.centroids).astype(np.int32)
+        order = np.argsort(self.assignments, kind='stable')
+        bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+        for i in range(len(self.centroids)):
+            rows = order[bounds[i]:bounds[i + 1]].astype(np.int64)
+            vectors = np.ascontiguousarray(matrix[rows])
+            self.lists.append(rows)
+            self.list_vectors.append(vectors)
+            self.list_sq_norms.append(np.einsum('ij,ij->i', vectors, vectors))
+        self.trained_size = size
+
+    def needs_rebuild(self, size: int) -> bool:
+        """Centroids drift as the gallery grows; retrain once it has doubled"""
+        return self.centroids is None or size > 2 * self.trained_size
+
+    def update(self, row: int, vector: np.ndarray):
+        """
+        Insert a new row, or re-file an updated row under its closest list
+
+        Args:
+            row: Gallery row index
+            vector: 128-d float32 encoding stored at that row
+        """
+        if self.centroids is None:
+            return
+        vector = np.asarray(vector, dtype=np.float32)
+        self.remove(row)
+        if row >= len(self.assignments):
+            grown = np.full(max(row + 1, 2 * len(self.assignments)), -1, dtype=np.int32)
+            grown[:len(self.assignments)] = self.assignments
+            self.assignments = grown
+
+        target = int(nearest_centroids(vector[None, :], self.centroids)[0])
+        self.assignments[row] = target
+        self.lists[target] = np.append(self.lists[target], row)
+        self.list_vectors[target] = np.vstack([self.list_vectors[target], vector[None, :]])
+        self.list_sq_norms[target] = np.append(self.list_sq_norms[target], np.float32(vector @ vector))
+
+    def remove(self, row: int):
+        """Drop a row from its list"""
+        current = int(self.assignments[row]) if row < len(self.assignments) else -1
+        if current < 0:
+            return
+        keep = self.lists[current] != row
+        self.lists[current] = self.lists[current][keep]
+        self.list_vectors[current] = self.list_vectors[current][keep]
+        self.list_sq_norms[current] = self.list_sq_norms[current][keep]
+        self.assignments[row] = -1
+
+    def relabel(self, old_row: int, new_row: int):
+        """Record that the gallery moved a row (e.g. swap-remove); vectors are unchanged"""
+        current = int(self.assignments[old_row]) if old_row < len(self.assignments) else -1
+        if current < 0:
+            return
+        rows = self.lists[current]
+        rows[rows == old_row] = new_row
+        self.assignments[new_row] = current
+        self.assignments[old_row] = -1
+
+    def search(self, queries: np.ndarray, k: int = 1, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k search
+
+        Work is grouped by list rather than by query: each probed list is
+        scored against all queries that probe it with a single matrix product.
+
+        Args:
+            queries: (Q, 128) float32 query encodings
+            k: Number of neighbours per query
+            nprobe: Lists scanned per query (defaults to self.nprobe)
+
+        Returns:
+            (rows, distances), each (Q, k) sorted by distance; missing
+            neighbours are -1 / inf
+        """
+        num_queries = len(queries)
+        nprobe = max(1, min(nprobe or self.nprobe, len(self.centroids)))
+        best_rows = np.full((num_queries, k), -1, dtype=np.int64)
+        best_sq = np.full((num_queries, k), np.inf, dtype=np.float32)
+
+        query_sq = np.einsum('ij,ij->i', queries, queries)
+        centroid_sq = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        coarse = query_sq[:, None] + centroid_sq[None, :] - 2.0 * (queries @ self.centroids.T)
+        probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+
+        probe_lists = probes.ravel()
+        probe_queries = np.repeat(np.arange(num_queries), nprobe)
+        order = np.argsort(probe_lists, kind='stable')
+        probe_lists, probe_queries = probe_lists[order], probe_queries[order]
+        starts = np.flatnonzero(np.r_[True, probe_lists[1:] != probe_lists[:-1]])
+        ends = np.r_[starts[1:], len(probe_lists)]
+
+        for start, end in zip(starts, ends):
+            p = probe_lists[start]
+            if len(self.lists[p]) == 0:
+                continue
+            qs = probe_queries[start:end]
+            sq = query_sq[qs, None] + self.list_sq_norms[p][None, :] - 2.0 * (queries[qs] @ self.list_vectors[p].T)
+            top = min(k, sq.shape[1])
+            if sq.shape[1] > top:
+                part = np.argpartition(sq, top - 1, axis=1)[:, :top]
+            else:
+                part = np.broadcast_to(np.arange(top), (len(qs), top))
+            merged_sq = np.concatenate([best_sq[qs], np.take_along_axis(sq, part, axis=1)], axis=1)
+            merged_rows = np.concatenate([best_rows[qs], self.lists[p][part]], axis=1)
+            keep = np.argsort(merged_sq, axis=1)[:, :k]
+            best_sq[qs] = np.take_along_axis(merged_sq, keep, axis=1)
+            best_rows[qs] = np.take_along_axis(merged_rows, keep, axis=1)
+
+        np.maximum(best_sq, 0.0, out=best_sq)
+        return best_rows, np.sqrt(best_sq)
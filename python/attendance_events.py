@@ -0,0 +1,169 @@
+"""
+Server-side attendance confirmation
+Every camera (room) runs its own attendance session, fed only by that
+camera's recognition passes.
+A student is only confirmed present once they were matched with enough
+confidence in enough separate passes inside a sliding time window, so a
+single lucky frame (or a one-off mismatch) never marks anyone. Only faces
+encoded afresh in a pass vote: an encoding the tracker or motion gate carries
+over to later passes is the same evidence again, not a new match. Each student
+is confirmed at most once per session; clients read the ordered list of
+confirmed events instead of re-evaluating raw detections.
+"""
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+class AttendanceSession:
+    """Evidence and confirmed presence events of one live session"""
+
+    def __init__(self, camera_id: str, roster_size: int = 0, min_confidence: float = 0.5):
+        self.id = uuid.uuid4().hex
+        self.camera_id = camera_id
+        self.roster_size = roster_size
+        # Match confidence that counts as a vote in this session (the client's threshold)
+        self.min_confidence = min_confidence
+        self.started_at = datetime.now().isoformat()
+        # student_id -> (captured_at, confidence, camera_id) of recent confident matches
+        self.evidence: Dict[str, Deque[Tuple[float, float, str]]] = {}
+        # Last recognition pass counted (a pass votes at most once per student)
+        self.last_pass = 0
+        self.events: List[Dict] = []
+        self.present: Dict[str, Dict] = {}
+        self.condition = threading.Condition()
+        self.closed = False
+
+    def wait_for_events(self, after: int, timeout: float) -> Tuple[List[Dict], bool]:
+        """
+        Block until there are events past sequence `after`, the session ends, or timeout
+
+        Returns:
+            (new_events, closed)
+        """
+        with self.condition:
+            if len(self.events) <= after and not self.closed:
+                self.condition.wait(timeout=timeout)
+            return self.events[after:], self.closed
+
+    def summary(self) -> Dict:
+        """JSON-serializable session status"""
+        with self.condition:
+            return {
+                "session_id": self.id,
+                "camera_id": self.camera_id,
+                "started_at": self.started_at,
+                "roster": self.roster_size,
+                "min_confidence": self.min_confidence,
+                "present": len(self.present),
+                "events": len(self.events)
+            }
+
+
+class AttendanceVoter:
+    """Confirms presence from K confident matches within M seconds, once per student per camera session"""
+
+    def __init__(self, min_hits: int = 3, window: float = 15.0, min_confidence: float = 0.5):
+        """
+        Initialize voter
+
+        Args:
+            min_hits: Confident matches (separate recognition passes) needed to confirm
+            window: Sliding window in seconds the matches must fall in
+            min_confidence: Default match confidence (1 - face distance) that counts
+                as a vote; a session can be started with its own
+        """
+        self.min_hits = max(1, min_hits)
+        self.window = window
+        self.min_confidence = min_confidence
+        self.lock = threading.Lock()
+        # Active session per camera ID
+        self.sessions: Dict[str, AttendanceSession] = {}
+
+    def session_for(self, camera_id: str) -> Optional[AttendanceSession]:
+        """Active session of a camera, or None"""
+        return self.sessions.get(camera_id)
+
+    def start(self, camera_id: str, roster_size: int = 0, min_confidence: Optional[float] = None) -> AttendanceSession:
+        """Start a new session for a camera (ends that camera's previous one)"""
+        session = AttendanceSession(
+            camera_id, roster_size, self.min_confidence if min_confidence is None else min_confidence
+        )
+        with self.lock:
+            previous = self.sessions.get(camera_id)
+            self.sessions[camera_id] = session
+        if previous is not None:
+            self._close(previous)
+        print(f"🗳️ Attendance session {session.id[:8]} started on {camera_id} "
+              f"({self.min_hits} matches >= {session.min_confidence:.0%} in {self.window:g}s)")
+        return session
+
+    def clear(self, camera_id: str):
+        """End a camera's current session"""
+        with self.lock:
+            previous = self.sessions.pop(camera_id, None)
+        if previous is not None:
+            self._close(previous)
+
+    @staticmethod
+    def _close(session: AttendanceSession):
+        with session.condition:
+            session.closed = True
+            session.condition.notify_all()
+
+    def observe(self, camera_id: str, result):
+        """
+        Count one published recognition pass as votes in its camera's session
+
+        Args:
+            camera_id: Camera that produced the result
+            result: RecognitionResult (matches against that camera's roster)
+        """
+        session = self.sessions.get(camera_id)
+        if session is None:
+            return
+        with session.condition:
+            if session.closed or session.last_pass == result.seq:
+                return
+            session.last_pass = result.seq
+
+            # Best confident match per student in this pass
+            votes: Dict[str, Dict] = {}
+            for face in result.results:
+                student_id = face.get("student_id")
+                if student_id is None or student_id in session.present or face["confidence"] < session.min_confidence:
+                    continue
+                if not face.get("fresh", True):
+                    continue
+                if student_id not in votes or face["confidence"] > votes[student_id]["confidence"]:
+                    votes[student_id] = face
+
+            for student_id, face in votes.items():
+                evidence = session.evidence.setdefault(student_id, deque())
+                evidence.append((result.captured_at, face["confidence"], camera_id))
+                while evidence and evidence[0][0] < result.captured_at - self.window:
+                    evidence.popleft()
+                if len(evidence) >= self.min_hits:
+                    self._confirm(session, student_id, face, evidence, camera_id, result.captured_at)
+
+    def _confirm(self, session: AttendanceSession, student_id: str, face: Dict,
+                 evidence: Deque[Tuple[float, float, str]], camera_id: str, captured_at: float):
+        """Emit the student's presence event (caller holds the session condition)"""
+        event = {
+            "seq": len(session.events) + 1,
+            "session_id": session.id,
+            "student_id": student_id,
+            "name": face["name"],
+            "confidence": sum(hit[1] for hit in evidence) / len(evidence),
+            "hits": len(evidence),
+            "camera_id": camera_id,
+            "timestamp": datetime.fromtimestamp(captured_at).isoformat(),
+            "confirmed_at": datetime.now().isoformat()
+        }
+        session.events.append(event)
+        session.present[student_id] = event
+        del session.evidence[student_id]
+        session.condition.notify_all()
+        print(f"✅ Present: {face['name']} ({student_id}) after {event['hits']} matches")
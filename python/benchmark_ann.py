@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark approximate (IVF) gallery matching against exact brute-force search
+Uses the real gallery from the encodings store when it is large enough,
+otherwise a synthetic university-scale gallery
+
+Usage: python benchmark_ann.py [gallery_size] [queries]
+"""
+import sys
+import time
+import numpy as np
+from face_gallery import FaceGallery, ENCODING_DIM
+from encodings_store import EncodingsStore
+
+
+def synthetic_gallery(size: int, seed: int = 0) -> np.ndarray:
+    """Clustered 128-d encodings roughly shaped like dlib embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 0.12, size=(max(1, size // 50), ENCODING_DIM))
+    labels = rng.integers(0, len(centers), size=size)
+    return (centers[labels] + rng.normal(0, 0.05, size=(size, ENCODING_DIM))).astype(np.float32)
+
+
+def load_gallery(size: int) -> np.ndarray:
+    """Real encodings if available and large enough, synthetic otherwise"""
+    store = EncodingsStore("encodings/known_faces")
+    if store.exists():
+        encodings = store.load()[0]
+        if len(encodings) >= size:
+            print(f"📂 Using {size} real encodings from {store.manifest_path}")
+            return np.asarray(encodings[:size])
+    print(f"🧪 Using {size} synthetic encodings")
+    return synthetic_gallery(size)
+
+
+def time_search(gallery: FaceGallery, queries: np.ndarray, exact: bool, repeats: int = 5):
+    """Median latency per frame batch (ms) and top-1 IDs"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = gallery.search(queries, k=1, exact=exact)
+        timings.append((time.perf_counter() - start) * 1000)
+    ids = [r[0][0] if r else None for r in results]
+    return float(np.median(timings)), ids
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    print("=" * 60)
+    print("🚀 Gallery Matching Benchmark: IVF vs exact")
+    print("=" * 60)
+
+    encodings = load_gallery(size)
+    ids = [str(i) for i in range(len(encodings))]
+
+    start = time.perf_counter()
+    gallery = FaceGallery(encodings, ids, ids, ann_min_size=1)
+    print(f"🗂️ Index build: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    # Queries: enrolled faces seen again with capture noise (one frame of a lecture hall)
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(encodings), size=num_queries, replace=False)
+    queries = encodings[picks] + rng.normal(0, 0.03, size=(num_queries, ENCODING_DIM)).astype(np.float32)
+
+    exact_ms, exact_ids = time_search(gallery, queries, exact=True)
+    print(f"\n{'mode':<12}{'nprobe':>8}{'ms/frame':>12}{'recall@1':>12}")
+    print(f"{'exact':<12}{'-':>8}{exact_ms:>12.2f}{1.0:>12.3f}")
+
+    for nprobe in (1, 2, 4, 8, 16, 32):
+        gallery.ann_nprobe = nprobe
+        ann_ms, ann_ids = time_search(gallery, queries, exact=False)
+        recall = np.mean([a == e for a, e in zip(ann_ids, exact_ids)])
+        print(f"{'ivf':<12}{nprobe:>8}{ann_ms:>12.2f}{recall:>12.3f}")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark face detector backends on CPU: HOG, YOLO (ultralytics/torch),
+YOLO on ONNX Runtime (fp32) and YOLO on ONNX Runtime (static int8)
+Reports load time, per-frame and batched latency, and how many of the
+reference backend's faces each backend finds (IoU >= 0.5). Backends whose
+dependencies are not installed are skipped.
+
+Usage: python benchmark_detectors.py [image_dir] [frames]
+(image_dir defaults to ONNX_CALIBRATION_DIR; it is also the int8 calibration set)
+"""
+import glob
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from face_tracker import box_iou
+
+BATCH = 8
+
+
+def load_frames(image_dir: str, count: int):
+    """RGB frames from image_dir, or synthetic noise frames (latency only) if none"""
+    paths = sorted(glob.glob(os.path.join(image_dir, "*.jpg")) + glob.glob(os.path.join(image_dir, "*.png"))) if image_dir else []
+    frames = [cv2.cvtColor(image, cv2.COLOR_BGR2RGB) for image in map(cv2.imread, paths[:count]) if image is not None]
+    if frames:
+        print(f"📂 Using {len(frames)} frames from {image_dir}")
+        return frames
+    print(f"🧪 No images found, using {count} synthetic frames (latency only, no faces)")
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, size=(720, 1280, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def build_backends(image_dir: str):
+    """(name, loader) pairs; a loader returns a (single, batch) pair of detect callables"""
+    def hog():
+        import face_recognition
+        single = lambda frame: face_recognition.face_locations(frame, model="hog")
+        return single, lambda frames: [single(frame) for frame in frames]
+
+    def yolo():
+        from yolo_face_detector import YOLOFaceDetector
+        detector = YOLOFaceDetector(model_name="yolov8n-face.pt", device="cpu")
+        return detector.detect, lambda frames: detector.detect_batch(frames, batch_size=BATCH)
+
+    def onnx(calibration_dir=None):
+        from onnx_face_detector import ONNXFaceDetector
+        detector = ONNXFaceDetector(
+            model_path=os.getenv("ONNX_MODEL", "yolov8n-face.onnx"),
+            calibration_dir=calibration_dir,
+            threads=int(os.getenv("ONNX_THREADS", "0"))
+        )
+        return detector.detect, lambda frames: detector.detect_batch(frames, batch_size=BATCH)
+
+    backends = [("hog", hog), ("yolo", yolo), ("onnx-fp32", onnx)]
+    if image_dir:
+        backends.append(("onnx-int8", lambda: onnx(image_dir)))
+    return backends
+
+
+def agreement(found, reference) -> float:
+    """Fraction of reference boxes matched by a found box with IoU >= 0.5"""
+    total = sum(len(boxes) for boxes in reference)
+    if total == 0:
+        return float("nan")
+    matched = sum(
+        sum(1 for ref in ref_boxes if any(box_iou(ref, box) >= 0.5 for box in boxes))
+        for boxes, ref_boxes in zip(found, reference)
+    )
+    return matched / total
+
+
+def main():
+    image_dir = sys.argv[1] if len(sys.argv) > 1 else os.getenv("ONNX_CALIBRATION_DIR", "")
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+    print("=" * 60)
+    print("🚀 Face Detector Benchmark (CPU)")
+    print("=" * 60)
+
+    frames = load_frames(image_dir, count)
+    rows = []
+    for name, loader in build_backends(image_dir):
+        try:
+            start = time.perf_counter()
+            single, batch = loader()
+            load_s = time.perf_counter() - start
+        except Exception as e:
+            print(f"⏭️ Skipping {name}: {e}")
+            continue
+
+        single(frames[0])  # Warm-up
+        timings = []
+        found = []
+        for frame in frames:
+            start = time.perf_counter()
+            found.append(single(frame))
+            timings.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        batch(frames)
+        batch_ms = (time.perf_counter() - start) * 1000 / len(frames)
+
+        rows.append((name, load_s, float(np.median(timings)), batch_ms, sum(len(boxes) for boxes in found), found))
+
+    if not rows:
+        print("❌ No detector backend available")
+        return
+    # Reference: the torch model the ONNX variants are converted from, else the first that ran
+    by_name = {row[0]: row[5] for row in rows}
+    reference_name = next((name for name in ("yolo", "onnx-fp32") if name in by_name), rows[0][0])
+    reference = by_name[reference_name]
+    print(f"\n📐 Agreement is measured against {reference_name}")
+
+    print(f"\n{'backend':<12}{'load s':>8}{'ms/frame':>10}{'batched':>10}{'faces':>8}{'agree':>8}")
+    for name, load_s, frame_ms, batch_ms, faces, found in rows:
+        agree = agreement(found, reference)
+        print(f"{name:<12}{load_s:>8.2f}{frame_ms:>10.1f}{batch_ms:>10.1f}{faces:>8}{agree:>8.3f}")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Camera registry for multi-room deployments
+Each registered camera owns its FFmpeg stream, recognition worker, MJPEG
+broadcast hubs and PTZ patrol state. Recognition passes for all cameras
+share one RecognitionScheduler, so adding rooms doesn't add dlib threads.
+Cameras added through the API are persisted to a JSON registry file.
+"""
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from camera_stream_ffmpeg import CameraStreamFFmpeg
+from mjpeg_hub import MjpegHub
+from face_tracker import FaceTracker
+from motion_gate import MotionGate
+from recognition_worker import RecognitionWorker, RecognitionScheduler
+
+
+def parse_camera_ip(rtsp_url: str) -> Optional[str]:
+    """Extract camera IP from RTSP URL"""
+    match = re.search(r'@([\d.]+):', rtsp_url)
+    if match:
+        return match.group(1)
+    return None
+
+
+def parse_camera_credentials(rtsp_url: str) -> Tuple[str, str]:
+    """Extract credentials from RTSP URL"""
+    # Handle URLs like rtsp://user:pass@@ip or rtsp://user:pass@ip
+    match = re.search(r'rtsp://([^:]+):([^@]+)@@?', rtsp_url)
+    if match:
+        username = match.group(1)
+        password = match.group(2)
+        return username, password
+    return 'admin', 'admin'
+
+
+class Camera:
+    """One room camera: stream, recognition worker, video hubs and PTZ state"""
+
+    def __init__(self, camera_id: str, rtsp_url: str, name: Optional[str] = None):
+        self.id = camera_id
+        self.name = name or camera_id
+        self.rtsp_url = rtsp_url
+        self.stream: Optional[CameraStreamFFmpeg] = None
+        self.worker: Optional[RecognitionWorker] = None
+        self.lock = threading.Lock()
+
+        # PTZ control (Hikvision ISAPI) uses the RTSP host and credentials
+        self.ip = parse_camera_ip(rtsp_url)
+        self.user, self.password = parse_camera_credentials(rtsp_url)
+
+        # Encode-once MJPEG broadcasters (session-roster labels / full-gallery labels)
+        self.hubs = {
+            False: MjpegHub(lambda: self.worker),
+            True: MjpegHub(lambda: self.worker, use_full_gallery=True)
+        }
+
+        # PTZ patrol state
+        self.patrol_active = False
+        self.patrol_thread: Optional[threading.Thread] = None
+        self.patrol_lock = threading.Lock()
+        self.patrol_stop_event = threading.Event()
+        self.patrol_config = {
+            'presets': [1, 2, 3],
+            'dwell_time': 5,
+            'loop': True
+        }
+
+    @property
+    def running(self) -> bool:
+        return self.stream is not None and self.stream.running
+
+    def start(self, face_detector, scheduler: RecognitionScheduler, min_interval: float = 0.0,
+              process_pool=None, motion_gating: bool = False, face_tracking: bool = False,
+              result_listener: Optional[Callable] = None) -> str:
+        """
+        Start the stream and register its recognition worker
+
+        Args:
+            face_detector: Shared FaceDetector
+            scheduler: Shared recognition scheduler
+            min_interval: Minimum seconds between recognition passes
+            process_pool: Optional RecognitionProcessPool; frames are then captured into shared memory
+            motion_gating: Skip or narrow recognition passes with a per-camera MotionGate
+            face_tracking: Track faces across passes and only re-encode new or changed ones
+            result_listener: Optional callback(camera_id, result) for every published result
+
+        Returns:
+            "started", "already_running" or "already_starting"
+        """
+        # Prevent concurrent start requests
+        if not self.lock.acquire(blocking=False):
+            return "already_starting"
+        try:
+            # If already running, don't restart
+            if self.running:
+                return "already_running"
+
+            if self.stream is not None:
+                self._stop_locked(scheduler)
+                time.sleep(0.5)  # Brief pause before restarting
+            stream = CameraStreamFFmpeg(self.rtsp_url, shared_memory=process_pool is not None)
+            stream.connect()
+            stream.start_stream()
+            self.stream = stream
+
+            self.worker = RecognitionWorker(
+                stream, face_detector, min_interval=min_interval, name=self.name, process_pool=process_pool,
+                motion_gate=MotionGate() if motion_gating else None,
+                tracker=FaceTracker() if face_tracking else None,
+                on_result=(lambda result: result_listener(self.id, result)) if result_listener else None,
+                camera_id=self.id
+            )
+            self.worker.start()
+            scheduler.add(self.worker)
+            return "started"
+        finally:
+            self.lock.release()
+
+    def stop(self, scheduler: RecognitionScheduler):
+        """Stop recognition and the stream"""
+        with self.lock:
+            self._stop_locked(scheduler)
+
+    def _stop_locked(self, scheduler: RecognitionScheduler):
+        if self.worker is not None:
+            scheduler.remove(self.worker)
+            self.worker.stop()
+            self.worker = None
+        if self.stream is not None:
+            try:
+                self.stream.stop_stream()
+            except Exception as e:
+                print(f"⚠️ Error stopping camera {self.id}: {e}")
+            self.stream = None
+
+    def stop_patrol(self):
+        """Stop the patrol thread safely"""
+        with self.patrol_lock:
+            if self.patrol_active:
+                self.patrol_active = False
+                self.patrol_stop_event.set()
+                if self.patrol_thread and self.patrol_thread.is_alive():
+                    self.patrol_thread.join(timeout=2)
+                self.patrol_thread = None
+                self.patrol_stop_event.clear()
+
+    def summary(self) -> Dict:
+        """JSON-serializable camera status (credentials omitted)"""
+        worker = self.worker
+        result = worker.latest() if worker is not None else None
+        return {
+            "id": self.id,
+            "name": self.name,
+            "running": self.running,
+            "ptz": self.ip is not None,
+            "patrol_active": self.patrol_active,
+            "last_detection": result.timestamp if result is not None else None,
+            "faces": len(result.results) if result is not None else 0
+        }
+
+
+class CameraManager:
+    """Registry of cameras sharing one face detector and recognition scheduler"""
+
+    def __init__(self, face_detector, scheduler: RecognitionScheduler, min_interval: float = 0.0,
+                 registry_path: Optional[str] = "cameras.json", process_pool=None, motion_gating: bool = False,
+                 face_tracking: bool = False, result_listener: Optional[Callable] = None):
+        """
+        Initialize manager
+
+        Args:
+            face_detector: FaceDetector shared by every camera
+            scheduler: Recognition thread pool shared by every camera
+            min_interval: Minimum seconds between recognition passes per camera
+            registry_path: JSON file persisting cameras added through the API (None = not persisted)
+            process_pool: Optional RecognitionProcessPool running detection/encoding in processes
+            motion_gating: Only recognize frames (and regions) that changed, plus periodic full passes
+            face_tracking: Reuse encodings of tracked faces between passes
+            result_listener: Optional callback(camera_id, result) run for every recognition pass
+        """
+        self.face_detector = face_detector
+        self.scheduler = scheduler
+        self.process_pool = process_pool
+        self.motion_gating = motion_gating
+        self.face_tracking = face_tracking
+        self.result_listener = result_listener
+        self.min_interval = min_interval
+        self.registry_path = registry_path
+        self.cameras: Dict[str, Camera] = {}
+        self._persisted: set = set()
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Register cameras saved in the registry file"""
+        if not self.registry_path or not os.path.exists(self.registry_path):
+            return
+        try:
+            with open(self.registry_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Camera registry unreadable: {e}")
+            return
+        for entry in entries:
+            try:
+                self.add(entry["id"], entry["rtsp_url"], entry.get("name"))
+            except ValueError as e:
+                print(f"⚠️ Skipping camera from registry: {e}")
+        print(f"📹 Loaded {len(entries)} cameras from {self.registry_path}")
+
+    def _save(self):
+        """Persist API-added cameras (caller holds the lock); the file is owner-only (0600)"""
+        if not self.registry_path:
+            return
+        entries = [
+            {"id": camera.id, "name": camera.name, "rtsp_url": camera.rtsp_url}
+            for camera_id, camera in self.cameras.items() if camera_id in self._persisted
+        ]
+        tmp_path = f"{self.registry_path}.tmp"
+        # RTSP URLs carry camera credentials: never let the file be group/world readable
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.chmod(tmp_path, 0o600)  # In case a stale tmp file existed with wider permissions
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.registry_path)
+
+    def add(self, camera_id: str, rtsp_url: str, name: Optional[str] = None, persist: bool = True) -> Camera:
+        """
+        Register a camera (not started)
+
+        Raises:
+            ValueError: If the ID is taken or the URL is missing
+        """
+        if not camera_id or not rtsp_url:
+            raise ValueError("Camera id and rtsp_url are required")
+        with self.lock:
+            if camera_id in self.cameras:
+                raise ValueError(f"Camera {camera_id} already exists")
+            camera = Camera(camera_id, rtsp_url, name)
+            self.cameras[camera_id] = camera
+            if persist:
+                self._persisted.add(camera_id)
+                self._save()
+        return camera
+
+    def remove(self, camera_id: str) -> bool:
+        """Stop and unregister a camera"""
+        with self.lock:
+            camera = self.cameras.pop(camera_id, None)
+            if camera is None:
+                return False
+            if camera_id in self._persisted:
+                self._persisted.discard(camera_id)
+                self._save()
+        camera.stop_patrol()
+        camera.stop(self.scheduler)
+        return True
+
+    def get(self, camera_id: str) -> Optional[Camera]:
+        with self.lock:
+            return self.cameras.get(camera_id)
+
+    def list(self) -> List[Camera]:
+        with self.lock:
+            return list(self.cameras.values())
+
+    def start(self, camera: Camera) -> str:
+        return camera.start(self.face_detector, self.scheduler, self.min_interval, self.process_pool,
+                            self.motion_gating, self.face_tracking, self.result_listener)
+
+    def stop(self, camera: Camera):
+        camera.stop(self.scheduler)
@@ -1,69 +1,160 @@
+import os
 import subprocess
 import threading
 import time
-from queue import Queue
 from typing import Optional
 import numpy as np
-import cv2
+from frame_ring import FrameRing, FrameLease
 
 class CameraStreamFFmpeg:
     """Camera stream using FFmpeg subprocess - more stable than cv2.VideoCapture"""
     
-    def __init__(self, rtsp_url: str, frame_queue_size: int = 2):
+    def __init__(self, rtsp_url: str, ring_slots: int = 6, detection_width: Optional[int] = None,
+                 shared_memory: bool = False):
+        """
+        Args:
+            rtsp_url: Camera RTSP URL
+            ring_slots: Preallocated buffers per frame ring
+            detection_width: Width of the extra RGB detection stream FFmpeg produces
+                alongside the full-resolution one (DETECTION_WIDTH, 0 = no detection stream)
+            shared_memory: Capture into shared memory so recognition processes can map frames
+        """
         self.rtsp_url = rtsp_url
-        self.frame_queue = Queue(maxsize=frame_queue_size)
         self.process = None
         self.thread = None
         self.running = False
         self.width = 1920
         self.height = 1080
+        
+        # Preallocated frame buffers: readers lease the latest one, they wait for a newer sequence number
+        self.ring = FrameRing((self.height, self.width, 3), slots=ring_slots, shared=shared_memory)
+        
+        # Small RGB frames for detection, decoded by the same FFmpeg process (second output pipe);
+        # frame N of both rings is the same camera frame
+        if detection_width is None:
+            detection_width = int(os.getenv("DETECTION_WIDTH", "960"))
+        self.detection_width = detection_width if 0 < detection_width < self.width else 0
+        self.detection_height = round(self.height * self.detection_width / self.width / 2) * 2
+        self.detection_ring = None
+        if self.detection_width:
+            self.detection_ring = FrameRing(
+                (self.detection_height, self.detection_width, 3), slots=ring_slots, shared=shared_memory
+            )
+        self.detection_pipe = None
+        self.detection_thread = None
+        
+        # Each (re)connect starts a new generation; frame sequence numbers continue from seq_base
+        self._connect_lock = threading.Lock()
+        self.generation = 0
+        self.seq_base = 0
+    
+    @property
+    def has_detection_stream(self) -> bool:
+        return self.detection_ring is not None
     
     def connect(self):
         """Start FFmpeg process to read RTSP stream"""
         print(f"🔗 Connecting via FFmpeg to camera...")
         
-        # FFmpeg command to read RTSP and output raw frames
-        command = [
-            'ffmpeg',
-            '-rtsp_transport', 'tcp',  # Use TCP for more stability
-            '-i', self.rtsp_url,
-            '-f', 'image2pipe',
-            '-pix_fmt', 'bgr24',
-            '-vcodec', 'rawvideo',
-            '-s', f'{self.width}x{self.height}',
-            '-r', '5',  # 5 FPS
-            '-'
-        ]
+        pass_fds = ()
+        detection_read_fd = None
+        if self.has_detection_stream:
+            # One decode, two outputs: full-res BGR on stdout, detection-res RGB on a second pipe
+            detection_read_fd, detection_write_fd = os.pipe()
+            pass_fds = (detection_write_fd,)
+            command = [
+                'ffmpeg',
+                '-rtsp_transport', 'tcp',  # Use TCP for more stability
+                '-i', self.rtsp_url,
+                '-filter_complex',
+                f'[0:v]fps=5,scale={self.width}:{self.height},split=2[full][src];'
+                f'[src]scale={self.detection_width}:{self.detection_height}[det]',
+                '-map', '[full]', '-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1',
+                '-map', '[det]', '-f', 'rawvideo', '-pix_fmt', 'rgb24', f'pipe:{detection_write_fd}'
+            ]
+        else:
+            # FFmpeg command to read RTSP and output raw frames
+            command = [
+                'ffmpeg',
+                '-rtsp_transport', 'tcp',  # Use TCP for more stability
+                '-i', self.rtsp_url,
+                '-f', 'image2pipe',
+                '-pix_fmt', 'bgr24',
+                '-vcodec', 'rawvideo',
+                '-s', f'{self.width}x{self.height}',
+                '-r', '5',  # 5 FPS
+                '-'
+            ]
         
         try:
-            self.process = subprocess.Popen(
+            process = subprocess.Popen(
                 command,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                bufsize=10**8
+                bufsize=0,  # Unbuffered: frames are read straight into ring buffers
+                pass_fds=pass_fds
             )
-            print("✅ FFmpeg process started successfully")
         except Exception as e:
             print(f"❌ FFmpeg connection error: {e}")
+            if detection_read_fd is not None:
+                os.close(detection_read_fd)
             raise
+        finally:
+            for fd in pass_fds:
+                os.close(fd)
+        
+        with self._connect_lock:
+            old_pipe = self.detection_pipe
+            self.process = process
+            self.detection_pipe = os.fdopen(detection_read_fd, 'rb', buffering=0) if detection_read_fd is not None else None
+            self.seq_base = max(self.ring.seq, self.detection_ring.seq if self.detection_ring else 0)
+            self.generation += 1
+        if old_pipe is not None:
+            old_pipe.close()
+        print("✅ FFmpeg process started successfully")
     
     def start_stream(self):
         """Start streaming in background thread"""
         self.running = True
+        self.ring.reopen()
         self.thread = threading.Thread(target=self._stream_loop, daemon=True)
         self.thread.start()
+        if self.has_detection_stream:
+            self.detection_ring.reopen()
+            self.detection_thread = threading.Thread(target=self._detection_loop, daemon=True)
+            self.detection_thread.start()
         print("▶️  FFmpeg stream started")
     
+    @staticmethod
+    def _read_into(stream, view: memoryview) -> int:
+        """Fill view from an FFmpeg output pipe; returns bytes read (short only at EOF)"""
+        total = 0
+        size = len(view)
+        while total < size:
+            count = stream.readinto(view[total:])
+            if not count:
+                break
+            total += count
+        return total
+    
     def _stream_loop(self):
-        """Read frames continuously from FFmpeg"""
-        frame_size = self.width * self.height * 3  # 3 bytes per pixel (BGR)
+        """Read frames continuously from FFmpeg into free ring slots"""
+        frame_size = self.ring.frame_bytes  # 3 bytes per pixel (BGR)
+        generation = None
+        count = 0
         
         while self.running:
             try:
-                # Read raw frame data
-                raw_frame = self.process.stdout.read(frame_size)
+                with self._connect_lock:
+                    if self.generation != generation:
+                        generation, base, count = self.generation, self.seq_base, 0
+                    stdout = self.process.stdout
                 
-                if len(raw_frame) != frame_size:
+                # Read raw frame data into a slot no consumer holds
+                slot = self.ring.writable_slot()
+                bytes_read = self._read_into(stdout, self.ring.write_view(slot))
+                
+                if bytes_read != frame_size:
                     print("⚠️ Incomplete frame, reconnecting...")
                     # Kill the FFmpeg process
                     if self.process:
@@ -74,6 +165,8 @@ class CameraStreamFFmpeg:
                             self.process.kill()
                     
                     time.sleep(2)
+                    if not self.running:
+                        break
                     
                     # Reconnect without calling start_stream (we're already in the loop)
                     try:
@@ -83,36 +176,107 @@ class CameraStreamFFmpeg:
                         break
                     continue
                 
-                # Convert to numpy array
-                frame = np.frombuffer(raw_frame, dtype=np.uint8)
-                frame = frame.reshape((self.height, self.width, 3))
-                
-                # Empty queue if full (drop old frames)
-                if self.frame_queue.full():
-                    try:
-                        self.frame_queue.get_nowait()
-                    except:
-                        pass
-                
-                try:
-                    self.frame_queue.put(frame, timeout=1)
-                except:
-                    pass
+                # Publish as the latest frame (older unleased slots are simply reused)
+                count += 1
+                self.ring.publish(slot, time.time(), seq=base + count)
                     
             except Exception as e:
                 print(f"⚠️ FFmpeg stream error: {e}")
                 time.sleep(2)
     
+    def _detection_loop(self):
+        """Read detection-resolution frames; reconnects are driven by _stream_loop"""
+        ring = self.detection_ring
+        frame_size = ring.frame_bytes
+        generation = None
+        count = 0
+        
+        while self.running:
+            with self._connect_lock:
+                if self.generation != generation:
+                    generation, base, count = self.generation, self.seq_base, 0
+                pipe = self.detection_pipe
+            if pipe is None:
+                time.sleep(0.1)
+                continue
+            
+            try:
+                slot = ring.writable_slot()
+                bytes_read = self._read_into(pipe, ring.write_view(slot))
+            except (OSError, ValueError):
+                bytes_read = 0  # Pipe closed by a reconnect
+            
+            if bytes_read != frame_size:
+                # Wait for the main loop to reconnect
+                while self.running and self.generation == generation:
+                    time.sleep(0.1)
+                continue
+            
+            count += 1
+            ring.publish(slot, time.time(), seq=base + count)
+    
+    @property
+    def frame_seq(self) -> int:
+        """Sequence number of the latest frame"""
+        return self.ring.seq
+    
+    @property
+    def detection_seq(self) -> int:
+        """Sequence number of the latest frame available for detection"""
+        return (self.detection_ring or self.ring).seq
+    
     def get_frame(self) -> Optional[np.ndarray]:
-        """Get latest frame from queue"""
-        try:
-            return self.frame_queue.get(timeout=1)
-        except:
+        """Get a private copy of the latest frame (prefer lease_latest to avoid the copy)"""
+        lease = self.lease_latest()
+        if lease is None:
             return None
+        with lease:
+            return lease.frame.copy()
+    
+    def lease_latest(self) -> Optional[FrameLease]:
+        """
+        Lease the latest frame zero-copy (read-only); release() it when done
+        
+        Returns:
+            FrameLease with frame, seq and timestamp, or None before the first frame
+        """
+        return self.ring.lease_latest()
+    
+    def wait_for_lease(self, after_seq: int, timeout: float = 1.0) -> Optional[FrameLease]:
+        """
+        Block until a frame newer than after_seq arrives and lease it
+        
+        Returns:
+            FrameLease, or None on timeout / stream stop
+        """
+        return self.ring.wait_for_lease(after_seq, timeout)
+    
+    def add_detection_listener(self, listener):
+        """Run listener() whenever a new detection frame is published (see detection_seq)"""
+        (self.detection_ring or self.ring).add_listener(listener)
+    
+    def remove_detection_listener(self, listener):
+        (self.detection_ring or self.ring).remove_listener(listener)
+    
+    def wait_for_detection_lease(self, after_seq: int, timeout: float = 1.0) -> Optional[FrameLease]:
+        """
+        Lease the newest detection frame (RGB, detection resolution) newer than after_seq
+        
+        Without a detection stream this is the full-resolution BGR frame.
+        """
+        ring = self.detection_ring or self.ring
+        return ring.wait_for_lease(after_seq, timeout)
+    
+    def lease_frame(self, seq: int, timeout: float = 0.5) -> Optional[FrameLease]:
+        """Lease the full-resolution frame with sequence number seq (None if dropped or overwritten)"""
+        return self.ring.lease_seq(seq, timeout)
     
     def stop_stream(self):
         """Stop streaming"""
         self.running = False
+        self.ring.close()
+        if self.detection_ring is not None:
+            self.detection_ring.close()
         if self.process:
             self.process.terminate()
             try:
@@ -121,4 +285,11 @@ class CameraStreamFFmpeg:
                 self.process.kill()
         if self.thread:
             self.thread.join(timeout=5)
+        if self.detection_thread:
+            self.detection_thread.join(timeout=5)
+        if self.detection_pipe is not None:
+            self.detection_pipe.close()
+        self.ring.free_shared_memory()
+        if self.detection_ring is not None:
+            self.detection_ring.free_shared_memory()
         print("⏹️  FFmpeg stream stopped")
@@ -0,0 +1,351 @@
+"""
+Binary on-disk store for enrolled face encodings
+The gallery lives in a float32 .npy matrix that is memory-mapped on load, so
+startup is near-instant and several processes can share it zero-copy.
+A JSON manifest carries the version header, the student IDs/names and the
+name of the current matrix file.
+
+Enrollment changes are appended to a journal as they happen; a checkpoint
+folds the journal into a new matrix generation. Startup loads the latest
+checkpoint and replays the journal records written after it.
+
+Layout for base path "encodings/known_faces":
+    known_faces.json       manifest (format, version, generation, journal_seq, count, ids, names)
+    known_faces.<gen>.npy  (count, 128) float32 matrix for that generation
+    known_faces.journal    append-only log of upserts since the last checkpoint
+"""
+import glob
+import json
+import os
+import pickle
+import struct
+import threading
+import zlib
+import numpy as np
+from typing import List, Optional, Tuple
+
+STORE_FORMAT = "wiut-face-encodings"
+STORE_VERSION = 1
+ENCODING_DIM = 128
+
+# Journal record: magic, payload length, sequence number, CRC32 of payload
+JOURNAL_MAGIC = b"FJR1"
+JOURNAL_HEADER = struct.Struct("<4sIQI")
+JOURNAL_META_LEN = struct.Struct("<H")
+
+
+def _fsync_directory(directory: str):
+    """Persist a rename/create in directory (no-op where unsupported)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_atomic(path: str, write):
+    """Write via temp file + fsync + rename so path is either old or new, never partial"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class JournalRecord:
+    """One enrollment change read back from the journal"""
+
+    def __init__(self, seq: int, op: str, student_id: str, name: Optional[str] = None,
+                 vector: Optional[np.ndarray] = None):
+        self.seq = seq
+        self.op = op
+        self.student_id = student_id
+        self.name = name
+        self.vector = vector
+
+
+class EncodingsStore:
+    """Memory-mapped encodings matrix plus JSON ID/name sidecar and enrollment journal"""
+
+    def __init__(self, base_path: str = "encodings/known_faces"):
+        """
+        Initialize store
+
+        Args:
+            base_path: Path without extension; a legacy "<base_path>.pkl" is
+                migrated on first load
+        """
+        self.base_path = base_path
+        self.directory = os.path.dirname(base_path) or "."
+        self.manifest_path = f"{base_path}.json"
+        self.legacy_pickle_path = f"{base_path}.pkl"
+        self.journal_path = f"{base_path}.journal"
+        self.generation = 0
+
+        # Sequence numbers: last record folded into the checkpoint / last record written
+        self.checkpoint_seq = 0
+        self.journal_seq = 0
+        self.journal_lock = threading.Lock()
+        self.checkpoint_lock = threading.Lock()
+        self._journal_file = None
+
+    def _matrix_path(self, generation: int) -> str:
+        return f"{self.base_path}.{generation}.npy"
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    def read_manifest(self) -> dict:
+        """Read and validate the manifest header"""
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("format") != STORE_FORMAT:
+            raise ValueError(f"Not an encodings manifest: {self.manifest_path}")
+        if manifest.get("version", 0) > STORE_VERSION:
+            raise ValueError(
+                f"Encodings store version {manifest.get('version')} is newer than supported ({STORE_VERSION})"
+            )
+        return manifest
+
+    def load(self) -> Tuple[np.ndarray, List[str], List[str]]:
+        """
+        Load the gallery without copying the matrix
+
+        Returns:
+            (matrix, ids, names) where matrix is a read-only (N, 128) float32 memmap
+        """
+        manifest = self.read_manifest()
+        self.generation = manifest["generation"]
+        self.checkpoint_seq = manifest.get("journal_seq", 0)
+        self.journal_seq = max(self.journal_seq, self.checkpoint_seq)
+        count = manifest["count"]
+
+        if count == 0:
+            matrix = np.zeros((0, ENCODING_DIM), dtype=np.float32)
+        else:
+            matrix_path = os.path.join(self.directory, manifest["matrix"])
+            matrix = np.load(matrix_path, mmap_mode='r')
+            if matrix.shape != (count, ENCODING_DIM) or matrix.dtype != np.float32:
+                raise ValueError(
+                    f"Encodings matrix {matrix_path} has shape {matrix.shape} {matrix.dtype}, "
+                    f"manifest expects ({count}, {ENCODING_DIM}) float32"
+                )
+
+        return matrix, manifest["ids"], manifest["names"]
+
+    def save(self, matrix: np.ndarray, ids: List[str], names: List[str], journal_seq: Optional[int] = None):
+        """
+        Write an atomic checkpoint: a new generation of the gallery
+
+        The matrix goes to a fresh file and the manifest is swapped in last
+        (temp file, fsync, rename), so a crash leaves either the previous or
+        the new checkpoint and readers that still map an older generation
+        keep a valid view. Journal records up to journal_seq are then dropped.
+
+        Args:
+            matrix: (N, 128) gallery snapshot
+            ids: Student IDs aligned with matrix
+            names: Student names aligned with matrix
+            journal_seq: Last journal record included in the snapshot
+                (defaults to everything written so far)
+        """
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        if journal_seq is None:
+            journal_seq = self.journal_seq
+        os.makedirs(self.directory, exist_ok=True)
+
+        with self.checkpoint_lock:
+            generation = self.generation + 1
+            matrix_path = self._matrix_path(generation)
+            _write_atomic(matrix_path, lambda f: np.save(f, matrix))
+
+            manifest = {
+                "format": STORE_FORMAT,
+                "version": STORE_VERSION,
+                "generation": generation,
+                "journal_seq": journal_seq,
+                "dim": ENCODING_DIM,
+                "count": len(matrix),
+                "matrix": os.path.basename(matrix_path),
+                "ids": list(ids),
+                "names": list(names)
+            }
+            payload = json.dumps(manifest, ensure_ascii=False).encode('utf-8')
+            _write_atomic(self.manifest_path, lambda f: f.write(payload))
+            _fsync_directory(self.directory)
+
+            self.generation = generation
+            self.checkpoint_seq = journal_seq
+            self._remove_stale_generations()
+            self._compact_journal(journal_seq)
+
+    def _remove_stale_generations(self):
+        """Delete matrix files of older generations (mapped readers keep their inode)"""
+        current = os.path.basename(self._matrix_path(self.generation))
+        for path in glob.glob(f"{glob.escape(self.base_path)}.*.npy"):
+            if os.path.basename(path) != current:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def migrate_pickle(self) -> Optional[int]:
+        """
+        One-time migration from the legacy known_faces.pkl format
+
+        Returns:
+            Number of migrated encodings, or None if there was nothing to migrate
+        """
+        if self.exists() or not os.path.exists(self.legacy_pickle_path):
+            return None
+
+        with open(self.legacy_pickle_path, 'rb') as f:
+            data = pickle.load(f)
+
+        encodings = data.get("encodings", [])
+        matrix = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        ids = [str(sid) for sid in data.get("ids", [])]
+        names = list(data.get("names", []))
+        self.save(matrix, ids, names)
+        print(f"📦 Migrated {len(ids)} encodings from {self.legacy_pickle_path} to {self.manifest_path}")
+        return len(ids)
+
+    @property
+    def pending_records(self) -> int:
+        """Journal records not yet folded into a checkpoint"""
+        return self.journal_seq - self.checkpoint_seq
+
+    def append(self, op: str, student_id: str, name: Optional[str] = None,
+               vector: Optional[np.ndarray] = None) -> int:
+        """
+        Durably append one enrollment change to the journal
+
+        Args:
+            op: "upsert" or "delete"
+            student_id: Student ID
+            name: Student name
+            vector: 128-d encoding for upserts
+
+        Returns:
+            Sequence number of the written record
+        """
+        return self.append_many([(op, student_id, name, vector)])
+
+    def append_many(self, changes: List[Tuple[str, str, Optional[str], Optional[np.ndarray]]]) -> int:
+        """
+        Append several enrollment changes with a single write and fsync
+
+        Args:
+            changes: (op, student_id, name, vector) tuples
+
+        Returns:
+            Sequence number of the last written record
+        """
+        payloads = []
+        for op, student_id, name, vector in changes:
+            meta = json.dumps({"op": op, "id": student_id, "name": name}, ensure_ascii=False).encode('utf-8')
+            payload = JOURNAL_META_LEN.pack(len(meta)) + meta
+            if vector is not None:
+                payload += np.asarray(vector, dtype=np.float32).reshape(ENCODING_DIM).tobytes()
+            payloads.append(payload)
+
+        with self.journal_lock:
+            seq = self.journal_seq
+            chunks = []
+            for payload in payloads:
+                seq += 1
+                chunks.append(JOURNAL_HEADER.pack(JOURNAL_MAGIC, len(payload), seq, zlib.crc32(payload)))
+                chunks.append(payload)
+            if self._journal_file is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._journal_file = open(self.journal_path, 'ab')
+            self._journal_file.write(b"".join(chunks))
+            self._journal_file.flush()
+            os.fsync(self._journal_file.fileno())
+            self.journal_seq = seq
+        return seq
+
+    def _read_journal(self) -> Tuple[List[Tuple[int, bytes, bytes]], int]:
+        """
+        Read raw journal records
+
+        Returns:
+            ([(seq, raw_record, payload)], valid_length) - reading stops at the
+            first torn or corrupt record, valid_length is where it starts
+        """
+        if not os.path.exists(self.journal_path):
+            return [], 0
+        with open(self.journal_path, 'rb') as f:
+            data = f.read()
+
+        records = []
+        offset = 0
+        while offset + JOURNAL_HEADER.size <= len(data):
+            magic, length, seq, crc = JOURNAL_HEADER.unpack_from(data, offset)
+            end = offset + JOURNAL_HEADER.size + length
+            if magic != JOURNAL_MAGIC or end > len(data):
+                break
+            payload = data[offset + JOURNAL_HEADER.size:end]
+            if zlib.crc32(payload) != crc:
+                break
+            records.append((seq, data[offset:end], payload))
+            offset = end
+        return records, offset
+
+    def replay_journal(self, truncate: bool = True) -> List[JournalRecord]:
+        """
+        Read journal records written after the last checkpoint
+
+        A torn tail left by a crash mid-append is cut off so new records
+        are appended after the last valid one.
+
+        Args:
+            truncate: Cut off a torn tail; readers outside the service pass
+                False (the tail may be a record being appended right now)
+        """
+        with self.journal_lock:
+            raw_records, valid_length = self._read_journal()
+            if truncate and os.path.exists(self.journal_path) and valid_length < os.path.getsize(self.journal_path):
+                print(f"⚠️ Truncating torn journal tail at byte {valid_length}")
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(valid_length)
+                    os.fsync(f.fileno())
+
+            records = []
+            for seq, _, payload in raw_records:
+                self.journal_seq = max(self.journal_seq, seq)
+                if seq <= self.checkpoint_seq:
+                    continue
+                (meta_len,) = JOURNAL_META_LEN.unpack_from(payload, 0)
+                meta_end = JOURNAL_META_LEN.size + meta_len
+                meta = json.loads(payload[JOURNAL_META_LEN.size:meta_end].decode('utf-8'))
+                vector = None
+                if len(payload) > meta_end:
+                    vector = np.frombuffer(payload, dtype=np.float32, count=ENCODING_DIM, offset=meta_end)
+                records.append(JournalRecord(seq, meta["op"], meta["id"], meta.get("name"), vector))
+            return records
+
+    def _compact_journal(self, upto_seq: int):
+        """Drop journal records folded into the checkpoint, keeping any appended since"""
+        with self.journal_lock:
+            raw_records, _ = self._read_journal()
+            remaining = b"".join(raw for seq, raw, _ in raw_records if seq > upto_seq)
+            if self._journal_file is not None:
+                self._journal_file.close()
+                self._journal_file = None
+            if remaining or os.path.exists(self.journal_path):
+                _write_atomic(self.journal_path, lambda f: f.write(remaining))
+                _fsync_directory(self.directory)
+
+    def close(self):
+        """Close the journal file handle"""
+        with self.journal_lock:
+            if self._journal_file is not None:
+                self._journal_file.close()
+                self._journal_file = None
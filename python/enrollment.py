@@ -0,0 +1,281 @@
+"""
+Concurrent download-and-encode pipeline for student enrollment
+Photos are fetched over a pooled requests.Session with bounded concurrency and
+handed to a process pool running the expensive dlib enrollment encode; the
+resulting encodings are merged into the gallery in batches, and a student is
+only reported enrolled once the batch holding their encoding has merged.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+PHOTO_URL = "https://srs.wiut.uz/logo/{sid}.jpg"
+MIN_PHOTO_BYTES = 1000
+CANCELLED_REASON = "Cancelled"
+UNCHANGED_REASON = "Photo unchanged, existing embedding kept"
+
+# Detector instance owned by each encode worker process
+_worker_detector = None
+
+
+def _init_encode_worker():
+    """Process pool initializer: load a detect/encode-only FaceDetector once per worker"""
+    global _worker_detector
+    from face_detector import FaceDetector
+    _worker_detector = FaceDetector(load_gallery=False)
+
+
+def encode_photo(detector, student_id: str, photo: bytes) -> Tuple[Optional[np.ndarray], Optional[str]]:
+    """
+    Decode a JPEG and compute its enrollment encoding
+
+    Returns:
+        (encoding, None) on success, (None, reason) on failure
+    """
+    image = cv2.imdecode(np.frombuffer(photo, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None, "Image decode failed"
+    encoding = detector.encode_enrollment_image(image, student_id)
+    if encoding is None:
+        return None, "No face found"
+    return encoding, None
+
+
+def _encode_in_worker(student_id: str, photo: bytes) -> Tuple[Optional[np.ndarray], Optional[str]]:
+    return encode_photo(_worker_detector, student_id, photo)
+
+
+class EnrollmentPipeline:
+    """Pipelined photo download + face encoding for batches of students"""
+
+    def __init__(self, face_detector, cookie: str, download_workers: Optional[int] = None,
+                 encode_workers: Optional[int] = None, photo_cache=None, merge_batch: Optional[int] = None):
+        """
+        Initialize pipeline
+
+        Args:
+            face_detector: FaceDetector whose gallery receives the encodings
+            cookie: SRS session cookie used to download photos
+            download_workers: Concurrent photo downloads (ENROLL_DOWNLOAD_WORKERS)
+            encode_workers: Encoder processes (ENROLL_ENCODE_WORKERS, 0 = encode in-process)
+            photo_cache: Optional PhotoCache; students whose photo hash matches
+                their stored embedding are skipped
+            merge_batch: Encodings merged into the gallery per step (ENROLL_MERGE_BATCH)
+        """
+        self.face_detector = face_detector
+        self.photo_cache = photo_cache
+        self.download_workers = download_workers or int(os.getenv("ENROLL_DOWNLOAD_WORKERS", "8"))
+        if encode_workers is None:
+            encode_workers = int(os.getenv("ENROLL_ENCODE_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+        self.encode_workers = encode_workers
+        self.merge_batch = max(1, merge_batch or int(os.getenv("ENROLL_MERGE_BATCH", "32")))
+
+        # One keep-alive connection pool shared by all download threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.download_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Cookie": cookie,
+            "User-Agent": "Mozilla/5.0"
+        })
+
+        self._encode_pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_encode_pool(self) -> ProcessPoolExecutor:
+        """Lazily start the encoder processes (spawned, so they don't inherit Flask threads)"""
+        with self._pool_lock:
+            if self._encode_pool is None:
+                print(f"⚙️ Starting {self.encode_workers} enrollment encoder processes")
+                self._encode_pool = ProcessPoolExecutor(
+                    max_workers=self.encode_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_encode_worker
+                )
+            return self._encode_pool
+
+    def _reset_encode_pool(self):
+        """Drop a broken pool (e.g. a worker crashed) so the next batch starts a fresh one"""
+        with self._pool_lock:
+            if self._encode_pool is not None:
+                self._encode_pool.shutdown(wait=False, cancel_futures=True)
+                self._encode_pool = None
+
+    def download(self, student_id: str) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
+        """
+        Download a student's photo (revalidated against the photo cache if enabled)
+
+        Returns:
+            (photo_bytes, sha256_or_None, None) on success, (None, None, reason) on failure
+        """
+        image_url = PHOTO_URL.format(sid=student_id)
+        if self.photo_cache is not None:
+            return self.photo_cache.fetch(self.session, student_id, image_url, min_bytes=MIN_PHOTO_BYTES)
+        try:
+            response = self.session.get(image_url, timeout=15)
+        except Exception as e:
+            return None, None, str(e)
+        print(f"  Download {student_id}: {response.status_code}, size: {len(response.content)} bytes")
+        if response.status_code == 200 and len(response.content) > MIN_PHOTO_BYTES:
+            return response.content, None, None
+        return None, None, f"Download failed: status={response.status_code}, size={len(response.content)}"
+
+    def _embedding_is_current(self, student_id: str, photo_hash: Optional[str]) -> bool:
+        """True if the gallery already holds an embedding computed from this exact photo"""
+        return (
+            self.photo_cache is not None
+            and photo_hash is not None
+            and self.photo_cache.embedded_hash(student_id) == photo_hash
+            and self.face_detector.has_student(student_id)
+        )
+
+    @staticmethod
+    def parse_students(students: List[Dict]) -> List[Tuple[str, str]]:
+        """Normalize request payload entries to (student_id, name)"""
+        parsed = []
+        for student in students:
+            sid = student.get('studentId') or student.get('id')
+            if sid is None:
+                continue
+            sid = str(sid)
+            parsed.append((sid, student.get('fullName') or student.get('name') or sid))
+        return parsed
+
+    def run(self, students: List[Tuple[str, str]],
+            on_result: Optional[Callable[[str, bool, Optional[str]], None]] = None,
+            cancel_event: Optional[threading.Event] = None) -> Tuple[List[str], List[Dict]]:
+        """
+        Download, encode and enroll a batch of students
+
+        Args:
+            students: (student_id, name) pairs
+            on_result: Called as on_result(student_id, ok, reason) as each student finishes
+                (enrolled students once the merge holding their encoding has returned)
+            cancel_event: When set, remaining students are skipped with reason
+                "Cancelled"; encodings finished so far are still merged
+
+        Returns:
+            (success_ids, failed) where failed entries are {"id", "reason"}
+        """
+        success = []
+        failed = []
+        # Encoded students waiting for the next gallery merge
+        entries = []
+        photo_hashes = {}
+
+        def finish(sid: str, ok: bool, reason: Optional[str] = None):
+            if ok:
+                success.append(sid)
+            else:
+                failed.append({"id": sid, "reason": reason})
+            if on_result is not None:
+                on_result(sid, ok, reason)
+
+        def cancelled() -> bool:
+            return cancel_event is not None and cancel_event.is_set()
+
+        def merge(force: bool = False):
+            # Students are only reported enrolled once their encodings are in the gallery
+            if not entries or (len(entries) < self.merge_batch and not force):
+                return
+            batch = entries[:]
+            entries.clear()
+            try:
+                self.face_detector.add_student_encodings(batch)
+            except Exception as e:
+                print(f"  ❌ Gallery merge failed for {len(batch)} students: {e}")
+                for sid, _, _ in batch:
+                    finish(sid, False, f"Enrollment error: {e}")
+                return
+            for sid, _, _ in batch:
+                if self.photo_cache is not None and photo_hashes.get(sid):
+                    self.photo_cache.mark_embedded(sid, photo_hashes[sid])
+                finish(sid, True)
+
+        def download(sid: str) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
+            if cancelled():
+                return None, None, CANCELLED_REASON
+            return self.download(sid)
+
+        encode_pool = self._get_encode_pool() if self.encode_workers > 0 else None
+        encode_futures = {}
+        pool_broken = False
+
+        with ThreadPoolExecutor(max_workers=self.download_workers) as downloads:
+            download_futures = {
+                downloads.submit(download, sid): (sid, name) for sid, name in students
+            }
+            # Feed each photo to the encoders as soon as it arrives
+            for future in as_completed(download_futures):
+                sid, name = download_futures[future]
+                photo, photo_hash, reason = future.result()
+                if photo is not None and cancelled():
+                    photo, reason = None, CANCELLED_REASON
+                if photo is None:
+                    print(f"  {sid}: {reason}")
+                    finish(sid, False, reason)
+                    continue
+                if self._embedding_is_current(sid, photo_hash):
+                    print(f"  ♻️ {sid}: {UNCHANGED_REASON}")
+                    finish(sid, True, UNCHANGED_REASON)
+                    continue
+                photo_hashes[sid] = photo_hash
+                if encode_pool is None:
+                    self._collect(sid, name, lambda: encode_photo(self.face_detector, sid, photo), entries, finish)
+                    merge()
+                    continue
+                try:
+                    encode_futures[encode_pool.submit(_encode_in_worker, sid, photo)] = (sid, name)
+                except BrokenProcessPool as e:
+                    pool_broken = True
+                    finish(sid, False, f"Encoding error: {e}")
+
+        for future in as_completed(encode_futures):
+            sid, name = encode_futures[future]
+            if cancelled():
+                for pending in encode_futures:
+                    pending.cancel()
+            if future.cancelled():
+                finish(sid, False, CANCELLED_REASON)
+                continue
+            if isinstance(future.exception(), BrokenProcessPool):
+                pool_broken = True
+            self._collect(sid, name, future.result, entries, finish)
+            merge()
+
+        if pool_broken:
+            self._reset_encode_pool()
+
+        merge(force=True)
+        if self.photo_cache is not None:
+            self.photo_cache.save()
+        return success, failed
+
+    @staticmethod
+    def _collect(sid: str, name: str, encode: Callable, entries: List, finish: Callable):
+        """Run/await one encode; failures are finished here, encodings queued for the next merge"""
+        try:
+            encoding, reason = encode()
+        except Exception as e:
+            print(f"  ❌ Encoding error for {sid}: {e}")
+            finish(sid, False, f"Encoding error: {str(e)}")
+            return
+        if encoding is None:
+            print(f"  ⚠️ {reason} for {sid}")
+            finish(sid, False, reason)
+            return
+        entries.append((sid, name, encoding))
+        print(f"  ✅ Successfully encoded {sid}")
+
+    def shutdown(self):
+        """Stop encoder processes and close pooled connections"""
+        self._reset_encode_pool()
+        self.session.close()
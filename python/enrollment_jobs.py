@@ -0,0 +1,160 @@
+"""
+Background enrollment jobs
+/embed-students submits a job and returns its ID straight away; the job runs
+the EnrollmentPipeline in a background thread and records a progress event
+per student, which clients poll or stream (Server-Sent Events).
+"""
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from enrollment import CANCELLED_REASON
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_CANCELLED = "cancelled"
+JOB_FAILED = "failed"
+FINISHED_STATES = (JOB_COMPLETED, JOB_CANCELLED, JOB_FAILED)
+
+
+class EnrollmentJob:
+    """State and per-student progress of one enrollment batch"""
+
+    def __init__(self, students: List[Tuple[str, str]]):
+        self.id = uuid.uuid4().hex
+        self.students = students
+        self.status = JOB_QUEUED
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.finished_at: Optional[str] = None
+        self.finished_monotonic: Optional[float] = None
+        self.cancel_event = threading.Event()
+
+        # Ordered per-student results; index doubles as the stream event sequence
+        self.results: List[Dict] = []
+        self.condition = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def record(self, student_id: str, ok: bool, reason: Optional[str]):
+        """Append one student's outcome and wake stream readers"""
+        if ok:
+            status = "success"
+        elif reason == CANCELLED_REASON:
+            status = "cancelled"
+        else:
+            status = "failed"
+        with self.condition:
+            self.results.append({
+                "seq": len(self.results) + 1,
+                "id": student_id,
+                "status": status,
+                "reason": reason
+            })
+            self.condition.notify_all()
+
+    def set_status(self, status: str, error: Optional[str] = None):
+        with self.condition:
+            self.status = status
+            self.error = error
+            if status in FINISHED_STATES:
+                self.finished_at = datetime.now().isoformat()
+                self.finished_monotonic = time.monotonic()
+            self.condition.notify_all()
+
+    def wait_for_events(self, after: int, timeout: float) -> Tuple[List[Dict], bool]:
+        """
+        Block until there are results past sequence `after`, the job finishes, or timeout
+
+        Returns:
+            (new_results, finished)
+        """
+        with self.condition:
+            if len(self.results) <= after and not self.finished:
+                self.condition.wait(timeout=timeout)
+            return self.results[after:], self.finished
+
+    def summary(self) -> Dict:
+        """JSON-serializable job status"""
+        with self.condition:
+            results = list(self.results)
+            status = self.status
+        return {
+            "job_id": self.id,
+            "status": status,
+            "error": self.error,
+            "total": len(self.students),
+            "processed": len(results),
+            "success": [r["id"] for r in results if r["status"] == "success"],
+            "failed": [{"id": r["id"], "reason": r["reason"]} for r in results if r["status"] != "success"],
+            "results": results,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+
+class EnrollmentJobManager:
+    """Runs enrollment jobs in background threads and keeps recent ones for status queries"""
+
+    def __init__(self, pipeline, on_success=None, retention_seconds: float = 3600):
+        """
+        Initialize manager
+
+        Args:
+            pipeline: EnrollmentPipeline used to run jobs
+            on_success: Called after a job enrolled at least one student
+            retention_seconds: How long finished jobs stay queryable
+        """
+        self.pipeline = pipeline
+        self.on_success = on_success
+        self.retention_seconds = retention_seconds
+        self.jobs: Dict[str, EnrollmentJob] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, students: List[Tuple[str, str]]) -> EnrollmentJob:
+        """Create a job and start it in the background"""
+        job = EnrollmentJob(students)
+        with self.lock:
+            self._prune()
+            self.jobs[job.id] = job
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        print(f"🧾 Enrollment job {job.id} queued with {len(students)} students")
+        return job
+
+    def get(self, job_id: str) -> Optional[EnrollmentJob]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[EnrollmentJob]:
+        """Request cancellation; students already encoded stay enrolled"""
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel_event.set()
+            print(f"🛑 Cancelling enrollment job {job_id}")
+        return job
+
+    def _run(self, job: EnrollmentJob):
+        job.set_status(JOB_RUNNING)
+        try:
+            success, failed = self.pipeline.run(job.students, on_result=job.record, cancel_event=job.cancel_event)
+            if success and self.on_success is not None:
+                self.on_success()
+            job.set_status(JOB_CANCELLED if job.cancel_event.is_set() else JOB_COMPLETED)
+            print(f"📊 Job {job.id}: {len(success)} success, {len(failed)} failed ({job.status})")
+        except Exception as e:
+            print(f"❌ Enrollment job {job.id} failed: {e}")
+            job.set_status(JOB_FAILED, str(e))
+
+    def _prune(self):
+        """Forget finished jobs older than the retention window"""
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_monotonic is not None and now - job.finished_monotonic > self.retention_seconds
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
@@ -2,72 +2,302 @@ import cv2
 import face_recognition
 import numpy as np
 from pathlib import Path
-import pickle
 import os
+import threading
 from typing import Optional, List, Dict, Tuple
+from face_gallery import FaceGallery
+from encodings_store import EncodingsStore
+
+def non_max_suppression(face_locations, threshold=0.5) -> List[Tuple[int, int, int, int]]:
+    """
+    Drop duplicate face boxes, keeping the largest of each overlapping group
+    
+    Overlap is intersection over the smaller box, so a face cut at a tile
+    border (a partial box inside the full one) is suppressed as well.
+    
+    Args:
+        face_locations: (top, right, bottom, left) boxes
+        threshold: Overlap above which the smaller box is dropped
+    
+    Returns:
+        Kept boxes, largest first
+    """
+    if len(face_locations) < 2:
+        return list(face_locations)
+    boxes = np.asarray(face_locations, dtype=np.float64)
+    top, right, bottom, left = boxes.T
+    areas = (bottom - top) * (right - left)
+    order = np.argsort(-areas)
+    kept = []
+    while order.size:
+        index = order[0]
+        kept.append(face_locations[index])
+        rest = order[1:]
+        inter_h = np.clip(np.minimum(bottom[index], bottom[rest]) - np.maximum(top[index], top[rest]), 0, None)
+        inter_w = np.clip(np.minimum(right[index], right[rest]) - np.maximum(left[index], left[rest]), 0, None)
+        overlap = inter_h * inter_w / np.maximum(np.minimum(areas[index], areas[rest]), 1)
+        order = rest[overlap <= threshold]
+    return kept
 
 class FaceDetector:
-    def __init__(self, encodings_path="encodings/known_faces.pkl"):
-        self.encodings_path = encodings_path
-        self.known_face_encodings = []
-        self.known_face_names = []
-        self.known_face_ids = []
+    def __init__(self, encodings_path="encodings/known_faces", load_gallery=True):
+        """
+        Args:
+            encodings_path: Encodings store base path
+            load_gallery: Load the gallery and run journal compaction; False gives a
+                detect/encode-only instance (e.g. inside enrollment worker processes)
+        """
+        # Binary store base path; a legacy "<path>.pkl" is migrated on first load
+        self.encodings_path = encodings_path[:-len(".pkl")] if encodings_path.endswith(".pkl") else encodings_path
+        self.store = EncodingsStore(self.encodings_path)
+        
+        # Large galleries are matched through an approximate IVF index; small ones stay exact
+        ann_min_gallery = int(os.getenv("ANN_MIN_GALLERY", "5000"))  # 0 disables the index
+        self.gallery = FaceGallery(
+            ann_min_size=ann_min_gallery if ann_min_gallery > 0 else None,
+            ann_nprobe=int(os.getenv("ANN_NPROBE", "8"))
+        )
+        
+        # Optional roster-scoped views used by live sessions, keyed by camera ID (one session per room)
+        self.session_rosters: Dict[str, set] = {}
+        self.session_galleries: Dict[str, FaceGallery] = {}
+        self._session_lock = threading.Lock()
         
         # Detector configuration from environment
-        self.detector_backend = os.getenv("DETECTOR_BACKEND", "hog").lower()  # hog, cnn, or yolo
+        self.detector_backend = os.getenv("DETECTOR_BACKEND", "hog").lower()  # hog, cnn, yolo, or onnx
         self.detector_device = os.getenv("DETECTOR_DEVICE", "cpu").lower()  # cpu or cuda
         self.min_face_size = int(os.getenv("MIN_FACE_SIZE", "80"))  # Minimum face width in pixels
+        self.crop_padding = float(os.getenv("FACE_CROP_PADDING", "0.5"))  # Crop margin around each face, fraction of box size
+        
+        # Tiled full-resolution detection for small faces (0 = off)
+        self.tile_size = int(os.getenv("DETECTION_TILE_SIZE", "0"))  # Tile edge in full-resolution pixels
+        self.tile_overlap = float(os.getenv("DETECTION_TILE_OVERLAP", "0.25"))  # Fraction of a tile shared with its neighbour
+        self.tile_min_face_size = int(os.getenv("TILE_MIN_FACE_SIZE", "40"))  # Minimum face size when tiling
+        self.tile_nms_threshold = float(os.getenv("TILE_NMS_THRESHOLD", "0.5"))  # Overlap that marks a duplicate box
         
-        # Lazy-load YOLO detector if selected
+        # Lazy-load YOLO detector (ultralytics or ONNX Runtime) if selected
         self.yolo_detector = None
-        if self.detector_backend == "yolo":
+        self.yolo_batcher = None
+        self.yolo_batch_size = int(os.getenv("YOLO_BATCH_SIZE", "16"))  # Images per batched forward pass
+        if self.detector_backend in ("yolo", "onnx"):
             self._init_yolo_detector()
         
         print(f"🔍 Face detector: {self.detector_backend.upper()} on {self.detector_device.upper()}")
         print(f"📏 Minimum face size: {self.min_face_size}px")
+        if self.tile_size > 0:
+            print(f"🧩 Tiled detection: {self.tile_size}px tiles, {self.tile_overlap:.0%} overlap, "
+                  f"min face {self.tile_min_face_size}px")
+        
+        # Background compaction folds the enrollment journal into a checkpoint
+        self.compact_interval = float(os.getenv("JOURNAL_COMPACT_INTERVAL", "300"))  # seconds
+        self.compact_records = int(os.getenv("JOURNAL_COMPACT_RECORDS", "200"))  # pending records that trigger compaction
+        self._compaction_event = threading.Event()
+        
+        if load_gallery:
+            self.load_encodings()
+            self._compaction_thread = threading.Thread(target=self._compaction_worker, daemon=True)
+            self._compaction_thread.start()
+    
+    @property
+    def known_face_encodings(self) -> np.ndarray:
+        """(N, 128) float32 matrix of enrolled encodings"""
+        return self.gallery.encodings
+    
+    @property
+    def known_face_names(self) -> List[str]:
+        return self.gallery.names
+    
+    @property
+    def known_face_ids(self) -> List[str]:
+        return self.gallery.ids
+    
+    def set_session_roster(self, student_ids, camera_id: str) -> Dict:
+        """
+        Restrict one camera's matching to the students of its live session
+        
+        Args:
+            student_ids: Roster student IDs
+            camera_id: Camera (room) the session runs in; other cameras keep their own roster
+        
+        Returns:
+            Dict with roster size, enrolled count and IDs missing from the gallery
+        """
+        roster = {str(sid) for sid in student_ids}
+        session_gallery = self.gallery.subset(roster)
+        with self._session_lock:
+            self.session_rosters[camera_id] = roster
+            self.session_galleries[camera_id] = session_gallery
+        enrolled = set(session_gallery.ids)
+        missing = sorted(roster - enrolled)
+        print(f"🎓 Session roster ({camera_id}): {len(roster)} students, {len(enrolled)} enrolled")
+        return {
+            "roster": len(roster),
+            "enrolled": len(enrolled),
+            "missing": missing
+        }
+    
+    def clear_session_roster(self, camera_id: str):
+        """Go back to matching one camera against the full gallery"""
+        with self._session_lock:
+            self.session_rosters.pop(camera_id, None)
+            self.session_galleries.pop(camera_id, None)
+    
+    def session_roster(self, camera_id: str) -> Optional[set]:
+        """Roster registered for a camera, or None"""
+        return self.session_rosters.get(camera_id)
+    
+    def session_gallery(self, camera_id: str) -> Optional[FaceGallery]:
+        """Roster view of the gallery for a camera, or None"""
+        return self.session_galleries.get(camera_id)
+    
+    def _refresh_session_gallery(self, student_ids=None):
+        """
+        Rebuild roster views from the full gallery
         
-        self.load_encodings()
+        Args:
+            student_ids: Only rebuild the rosters containing one of these IDs (None = all)
+        """
+        with self._session_lock:
+            for camera_id, roster in list(self.session_rosters.items()):
+                if student_ids is None or not roster.isdisjoint(student_ids):
+                    self.session_galleries[camera_id] = self.gallery.subset(roster)
+    
+    def _matching_gallery(self, use_full_gallery: bool = False, camera_id: Optional[str] = None) -> FaceGallery:
+        """Pick the camera's session view when one is registered, otherwise the full gallery"""
+        session_gallery = self.session_galleries.get(camera_id) if camera_id is not None else None
+        if use_full_gallery or session_gallery is None:
+            return self.gallery
+        return session_gallery
     
     def _init_yolo_detector(self):
-        """Initialize YOLO face detector"""
+        """Initialize YOLO face detector (ultralytics, or ONNX Runtime for DETECTOR_BACKEND=onnx)"""
         try:
-            from yolo_face_detector import YOLOFaceDetector
+            from yolo_face_detector import YOLOFaceDetector, DetectionBatcher
             device = "cuda" if self.detector_device == "cuda" else "cpu"
-            self.yolo_detector = YOLOFaceDetector(model_name="yolov8n-face.pt", device=device)
+            if self.detector_backend == "onnx":
+                from onnx_face_detector import ONNXFaceDetector
+                self.yolo_detector = ONNXFaceDetector(
+                    model_path=os.getenv("ONNX_MODEL", "yolov8n-face.onnx"),
+                    source_model="yolov8n-face.pt",
+                    calibration_dir=os.getenv("ONNX_CALIBRATION_DIR") or None,  # Set to build/use the int8 model
+                    device=device,
+                    threads=int(os.getenv("ONNX_THREADS", "0"))
+                )
+            else:
+                self.yolo_detector = YOLOFaceDetector(model_name="yolov8n-face.pt", device=device)
+            # Concurrent detections (several cameras' recognition threads) share forward passes
+            self.yolo_batcher = DetectionBatcher(
+                self.yolo_detector,
+                max_batch=self.yolo_batch_size,
+                max_wait=float(os.getenv("YOLO_BATCH_WAIT", "0.005"))
+            )
         except Exception as e:
-            print(f"⚠️ Failed to load YOLO detector: {e}")
+            print(f"⚠️ Failed to load {self.detector_backend.upper()} detector: {e}")
             print(f"⚠️ Falling back to HOG detector")
             self.detector_backend = "hog"
     
     def load_encodings(self):
-        """Load pre-calculated face encodings from file"""
+        """Load pre-calculated face encodings from the memory-mapped store"""
         # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(self.encodings_path), exist_ok=True)
-        
-        if os.path.exists(self.encodings_path):
-            with open(self.encodings_path, 'rb') as f:
-                data = pickle.load(f)
-                self.known_face_encodings = data.get("encodings", [])
-                self.known_face_names = data.get("names", [])
-                self.known_face_ids = data.get("ids", [])
+        os.makedirs(self.store.directory, exist_ok=True)
+        
+        # One-time conversion of the old pickle file
+        self.store.migrate_pickle()
+        
+        if self.store.exists():
+            matrix, ids, names = self.store.load()
+            self.gallery.load(matrix, ids, names, copy=False)
             print(f"✅ Loaded {len(self.known_face_encodings)} face encodings")
         else:
             print("⚠️ No encodings file found. New file will be created when students are enrolled.")
-            self.known_face_encodings = []
-            self.known_face_names = []
-            self.known_face_ids = []
+            self.gallery.load([], [], [])
+        
+        # Replay enrollments journaled after the last checkpoint
+        records = self.store.replay_journal()
+        for record in records:
+            if record.op == "upsert":
+                self.gallery.upsert(record.student_id, record.name, record.vector)
+            elif record.op == "delete":
+                self.gallery.remove(record.student_id)
+        if records:
+            print(f"📜 Replayed {len(records)} journaled enrollments")
+        self._refresh_session_gallery()
 
     def save_encodings(self):
-        """Save face encodings to file"""
-        data = {
-            "encodings": self.known_face_encodings,
-            "names": self.known_face_names,
-            "ids": self.known_face_ids
-        }
-        with open(self.encodings_path, 'wb') as f:
-            pickle.dump(data, f)
-        print(f"✅ Saved {len(self.known_face_encodings)} encodings to {self.encodings_path}")
+        """Write an atomic checkpoint of the gallery and drop the journal records it covers"""
+        with self.gallery.lock:
+            matrix = self.gallery.encodings.copy()
+            ids = list(self.gallery.ids)
+            names = list(self.gallery.names)
+            journal_seq = self.store.journal_seq
+        self.store.save(matrix, ids, names, journal_seq=journal_seq)
+        print(f"✅ Saved {len(ids)} encodings to {self.store.manifest_path}")
+
+    def request_compaction(self):
+        """Ask the background worker to checkpoint pending journal records now"""
+        self._compaction_event.set()
+
+    def _compaction_worker(self):
+        """Fold the journal into a checkpoint when asked, when it grows, or periodically"""
+        while True:
+            self._compaction_event.wait(timeout=self.compact_interval)
+            self._compaction_event.clear()
+            if self.store.pending_records == 0:
+                continue
+            try:
+                self.save_encodings()
+            except Exception as e:
+                print(f"❌ Encodings checkpoint failed: {e}")
 
+    def encode_enrollment_image(self, image: np.ndarray, student_id: str = "") -> Optional[np.ndarray]:
+        """
+        Compute a high-quality enrollment encoding from a photo, without touching the gallery
+        
+        Args:
+            image: OpenCV BGR image or RGB image
+            student_id: Student ID (for log messages only)
+            
+        Returns:
+            128-d encoding of the largest face, or None if no face could be encoded
+        """
+        # Validate image
+        if image is None or image.size == 0:
+            print(f"⚠️ Invalid image for student {student_id}")
+            return None
+            
+        # Convert to RGB if needed (OpenCV loads as BGR)
+        if len(image.shape) == 3 and image.shape[2] == 3:
+            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        else:
+            rgb_image = image
+            
+        # Detect faces using configured backend
+        face_locations = self._detect_faces(rgb_image)
+        
+        if not face_locations:
+            print(f"⚠️ No face found for student {student_id}")
+            return None
+        
+        # Select the largest face (to avoid background faces)
+        largest_face = max(
+            face_locations,
+            key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3])
+        )
+        
+        # Get encodings with higher quality settings for enrollment
+        encodings = face_recognition.face_encodings(
+            rgb_image, 
+            [largest_face],
+            num_jitters=5,  # More jitters = better quality, slower
+            model="large"   # Use large model for better accuracy
+        )
+        
+        if not encodings:
+            print(f"⚠️ Failed to encode face for student {student_id}")
+            return None
+        
+        return encodings[0]
+    
     def add_student_encoding(self, student_id: str, name: str, image: np.ndarray) -> bool:
         """
         Add a student encoding from an image array
@@ -81,93 +311,182 @@ class FaceDetector:
             bool: True if face found and encoded, False otherwise
         """
         try:
-            # Validate image
-            if image is None or image.size == 0:
-                print(f"⚠️ Invalid image for student {student_id}")
+            encoding = self.encode_enrollment_image(image, student_id)
+            if encoding is None:
                 return False
-                
-            # Convert to RGB if needed (OpenCV loads as BGR)
-            if len(image.shape) == 3 and image.shape[2] == 3:
-                rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            else:
-                rgb_image = image
-                
-            # Detect faces using configured backend
-            face_locations = self._detect_faces(rgb_image)
-            
-            if not face_locations:
-                print(f"⚠️ No face found for student {student_id}")
-                return False
-            
-            # Select the largest face (to avoid background faces)
-            largest_face = max(
-                face_locations,
-                key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3])
-            )
-            
-            # Get encodings with higher quality settings for enrollment
-            encodings = face_recognition.face_encodings(
-                rgb_image, 
-                [largest_face],
-                num_jitters=5,  # More jitters = better quality, slower
-                model="large"   # Use large model for better accuracy
-            )
-            
-            if not encodings:
-                print(f"⚠️ Failed to encode face for student {student_id}")
-                return False
-                
-            # Add to known lists
-            # Check if ID already exists and update it
-            if student_id in self.known_face_ids:
-                index = self.known_face_ids.index(student_id)
-                self.known_face_encodings[index] = encodings[0]
-                self.known_face_names[index] = name
-                print(f"Updated encoding for student {student_id}")
-            else:
-                self.known_face_encodings.append(encodings[0])
-                self.known_face_ids.append(student_id)
-                self.known_face_names.append(name)
-                print(f"Added new encoding for student {student_id}")
-                
+            self.add_student_encodings([(student_id, name, encoding)])
             return True
         except Exception as e:
             print(f"❌ Error encoding face for {student_id}: {e}")
             return False
     
+    def add_student_encodings(self, entries: List[Tuple[str, str, np.ndarray]]):
+        """
+        Merge precomputed encodings into the gallery in one step
+        
+        Args:
+            entries: (student_id, name, encoding) tuples
+        """
+        if not entries:
+            return
+        
+        # Add to gallery, updating rows in place if IDs already exist,
+        # and journal the changes (one fsync) so they survive a restart
+        with self.gallery.lock:
+            for student_id, name, encoding in entries:
+                if self.gallery.upsert(student_id, name, encoding):
+                    print(f"Updated encoding for student {student_id}")
+                else:
+                    print(f"Added new encoding for student {student_id}")
+            self.store.append_many([
+                ("upsert", student_id, name, encoding) for student_id, name, encoding in entries
+            ])
+        
+        if self.store.pending_records >= self.compact_records:
+            self.request_compaction()
+        
+        self._refresh_session_gallery({student_id for student_id, _, _ in entries})
+    
+    def remove_student_encoding(self, student_id: str) -> bool:
+        """
+        Remove a student's encoding from the gallery
+        
+        Returns:
+            bool: True if the student was enrolled and has been removed
+        """
+        student_id = str(student_id)
+        with self.gallery.lock:
+            if not self.gallery.remove(student_id):
+                return False
+            self.store.append("delete", student_id)
+        print(f"Removed encoding for student {student_id}")
+        
+        self._refresh_session_gallery({student_id})
+        if self.store.pending_records >= self.compact_records:
+            self.request_compaction()
+        return True
+    
+    def has_student(self, student_id: str) -> bool:
+        """O(1) check whether a student is enrolled"""
+        return student_id in self.gallery
+    
+    def partition_roster(self, student_ids) -> Tuple[List[str], List[str]]:
+        """
+        Split a roster into enrolled and missing students with one set operation
+        
+        Args:
+            student_ids: Roster student IDs
+        
+        Returns:
+            (present_ids, missing_ids) as strings, in roster order
+        """
+        roster = [str(sid) for sid in student_ids]
+        enrolled = self.gallery.enrolled(roster)
+        present = [sid for sid in roster if sid in enrolled]
+        missing = [sid for sid in roster if sid not in enrolled]
+        return present, missing
+    
     def _detect_faces(self, rgb_image: np.ndarray) -> List[Tuple[int, int, int, int]]:
         """Detect faces using configured backend"""
-        if self.detector_backend == "yolo" and self.yolo_detector:
-            return self.yolo_detector.detect(rgb_image)
+        if self.detector_backend in ("yolo", "onnx") and self.yolo_detector:
+            return self.yolo_batcher.detect(rgb_image)
         elif self.detector_backend == "cnn":
             return face_recognition.face_locations(rgb_image, model="cnn")
         else:  # hog (default)
             return face_recognition.face_locations(rgb_image, model="hog")
     
-    def detect_and_recognize_faces(self, frame, confidence_threshold=0.5):
+    @property
+    def batched_detection(self) -> bool:
+        """True if the backend detects several images in one forward pass"""
+        return self.detector_backend in ("yolo", "onnx") and self.yolo_detector is not None
+    
+    def _detect_faces_batch(self, rgb_images: List[np.ndarray]) -> List[List[Tuple[int, int, int, int]]]:
+        """Detect faces in several images, batched where the backend supports it"""
+        if self.batched_detection:
+            return self.yolo_detector.detect_batch(rgb_images, batch_size=self.yolo_batch_size)
+        return [self._detect_faces(rgb_image) for rgb_image in rgb_images]
+    
+    def detect_and_recognize_faces(self, frame, confidence_threshold=0.5, use_full_gallery=False, camera_id=None):
         """
         Detect and recognize faces in a frame
         
         Args:
             frame: OpenCV image frame
             confidence_threshold: Minimum confidence to mark as recognized
+            use_full_gallery: Match against every enrolled student even when
+                a session roster is registered
+            camera_id: Camera whose session roster applies (None = full gallery)
         
         Returns:
             List of dicts with student_id, name, confidence, bbox
         """
-        # Convert to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        face_locations, face_encodings = self.detect_and_encode_faces(frame)
+        return self.match_faces(face_locations, face_encodings, use_full_gallery=use_full_gallery, camera_id=camera_id)
+    
+    def detect_and_encode_faces(self, frame, detection_frame=None, roi=None) -> Tuple[List[Tuple[int, int, int, int]], np.ndarray]:
+        """
+        Detect faces in a frame and compute their encodings (the expensive half of recognition)
         
-        # Detect faces on smaller frame for speed
-        small_frame = cv2.resize(rgb_frame, (0, 0), fx=0.5, fy=0.5)
-        face_locations_small = self._detect_faces(small_frame)
+        Args:
+            frame: Full-resolution OpenCV (BGR) frame; only used to encode found faces
+            detection_frame: Optional downscaled RGB copy of the same frame to detect on
+            roi: Optional (top, right, bottom, left) fractions of the frame to detect in
         
-        if not face_locations_small:
-            return []
+        Returns:
+            (face_locations, encodings) - (top, right, bottom, left) boxes in
+            frame coordinates and an aligned (N, 128) encoding array
+        """
+        valid_faces = self.detect_face_locations(frame, detection_frame=detection_frame, roi=roi)
+        if not valid_faces:
+            return [], np.zeros((0, 128))
+        
+        # Get face encodings from ORIGINAL FULL-RES pixels (not downscaled), one padded crop per face
+        return valid_faces, self.encode_face_crops(frame, valid_faces)
+    
+    def detect_face_locations(self, frame, detection_frame=None, roi=None) -> List[Tuple[int, int, int, int]]:
+        """
+        Detect faces in a frame without encoding them
+        
+        Args:
+            frame: Full-resolution OpenCV (BGR) frame; boxes are returned in its coordinates
+            detection_frame: Optional downscaled RGB copy of the same frame to detect on
+                (e.g. the camera's detection stream); defaults to frame at half size
+            roi: Optional (top, right, bottom, left) fractions of the frame to detect in
+                (e.g. the moving area reported by a MotionGate); None = whole frame
+        
+        Returns:
+            (top, right, bottom, left) boxes in frame coordinates that pass the minimum face size
+        """
+        face_locations = self.detect_coarse(frame, detection_frame=detection_frame, roi=roi)
+        if self.tile_size > 0:
+            # Small (back-row) faces come from full-resolution tiles: one batched pass, or one tile
+            # after another (dlib holds the GIL, so threads wouldn't overlap them; RECOGNITION_PROCESSES
+            # spreads tiles over processes instead)
+            face_locations.extend(self.detect_in_tiles(frame, self.tile_regions(frame.shape, roi)))
+        return self.merge_detections(face_locations, tiled=self.tile_size > 0)
+    
+    def detect_coarse(self, frame, detection_frame=None, roi=None) -> List[Tuple[int, int, int, int]]:
+        """Detect on the downscaled frame; boxes in frame coordinates, not size-filtered"""
+        if detection_frame is None:
+            # Detect faces on smaller frame for speed (downscale before converting to RGB)
+            detection_frame = cv2.cvtColor(cv2.resize(frame, (0, 0), fx=0.5, fy=0.5), cv2.COLOR_BGR2RGB)
+        if roi is not None:
+            # Detect only inside the region and shift the boxes back to detection-frame coordinates
+            height, width = detection_frame.shape[:2]
+            offset_top, offset_left = int(roi[0] * height), int(roi[3] * width)
+            region = np.ascontiguousarray(
+                detection_frame[offset_top:int(roi[2] * height), offset_left:int(roi[1] * width)]
+            )
+            face_locations_small = [
+                (top + offset_top, right + offset_left, bottom + offset_top, left + offset_left)
+                for top, right, bottom, left in self._detect_faces(region)
+            ]
+        else:
+            face_locations_small = self._detect_faces(detection_frame)
         
         # Scale face locations back to original frame size
-        scale_factor = 2.0
-        face_locations_full = [
+        scale_factor = frame.shape[1] / detection_frame.shape[1]
+        return [
             (
                 int(top * scale_factor),
                 int(right * scale_factor),
@@ -176,23 +495,123 @@ class FaceDetector:
             )
             for top, right, bottom, left in face_locations_small
         ]
+    
+    def tile_regions(self, frame_shape, roi=None) -> List[Tuple[int, int, int, int]]:
+        """
+        Overlapping full-resolution tiles covering the frame (or the roi)
+        
+        Args:
+            frame_shape: Shape of the full-resolution frame
+            roi: Optional (top, right, bottom, left) fractions to cover instead of the whole frame
+        
+        Returns:
+            (top, right, bottom, left) tiles in frame pixels
+        """
+        height, width = frame_shape[:2]
+        top, right, bottom, left = roi if roi is not None else (0.0, 1.0, 1.0, 0.0)
+        top, bottom = int(top * height), int(bottom * height)
+        left, right = int(left * width), int(right * width)
+        step = max(1, int(self.tile_size * (1 - self.tile_overlap)))
+        
+        def starts(begin, end):
+            # Last tile is aligned to the far edge so nothing is cut off
+            if end - begin <= self.tile_size:
+                return [begin]
+            positions = list(range(begin, end - self.tile_size, step))
+            return positions + [end - self.tile_size]
+        
+        return [
+            (y, min(x + self.tile_size, right), min(y + self.tile_size, bottom), x)
+            for y in starts(top, bottom)
+            for x in starts(left, right)
+        ]
+    
+    def detect_in_tiles(self, frame, tiles) -> List[Tuple[int, int, int, int]]:
+        """Detect faces in full-resolution tiles (batched if supported); boxes in frame coordinates, not size-filtered"""
+        rgb_tiles = [cv2.cvtColor(frame[top:bottom, left:right], cv2.COLOR_BGR2RGB) for top, right, bottom, left in tiles]
+        face_locations = []
+        for (top, right, bottom, left), found in zip(tiles, self._detect_faces_batch(rgb_tiles)):
+            face_locations.extend(
+                (face_top + top, face_right + left, face_bottom + top, face_left + left)
+                for face_top, face_right, face_bottom, face_left in found
+            )
+        return face_locations
+    
+    def merge_detections(self, face_locations, tiled=False) -> List[Tuple[int, int, int, int]]:
+        """
+        Merge raw detections and apply the minimum face size
+        
+        Args:
+            face_locations: Boxes in frame coordinates (coarse pass plus any tiles)
+            tiled: Boxes include tile detections; duplicates across tile borders and
+                the coarse pass are suppressed and TILE_MIN_FACE_SIZE applies
+        
+        Returns:
+            Kept (top, right, bottom, left) boxes
+        """
+        min_face_size = self.min_face_size
+        if tiled:
+            face_locations = non_max_suppression(face_locations, self.tile_nms_threshold)
+            min_face_size = self.tile_min_face_size
         
         # Filter out faces that are too small (quality gate)
         valid_faces = []
-        for loc in face_locations_full:
+        for loc in face_locations:
             top, right, bottom, left = loc
             face_width = right - left
             face_height = bottom - top
-            if face_width >= self.min_face_size and face_height >= self.min_face_size:
+            if face_width >= min_face_size and face_height >= min_face_size:
                 valid_faces.append(loc)
             else:
-                print(f"⚠️ Skipping face: too small ({face_width}x{face_height}px, min={self.min_face_size}px)")
+                print(f"⚠️ Skipping face: too small ({face_width}x{face_height}px, min={min_face_size}px)")
         
-        if not valid_faces:
-            return []
+        return valid_faces
+    
+    def encode_face_crops(self, frame, face_locations, num_jitters=1) -> np.ndarray:
+        """
+        Encode faces from padded per-face crops of a BGR frame
+        
+        Only the crops are converted to RGB; landmarks and descriptors run on each
+        crop with the box remapped into crop coordinates, so the cost scales with
+        the number and size of faces rather than the camera resolution.
         
-        # Get face encodings from ORIGINAL FULL-RES frame (not downscaled)
-        face_encodings = face_recognition.face_encodings(rgb_frame, valid_faces, num_jitters=1)
+        Args:
+            frame: Full-resolution OpenCV (BGR) frame
+            face_locations: (top, right, bottom, left) boxes in frame coordinates
+            num_jitters: Re-samples per encoding
+        
+        Returns:
+            (N, 128) encodings aligned with face_locations
+        """
+        height, width = frame.shape[:2]
+        encodings = np.empty((len(face_locations), 128))
+        for i, (top, right, bottom, left) in enumerate(face_locations):
+            # Padding keeps the landmark-aligned 150x150 face chip inside the crop
+            pad = int(max(bottom - top, right - left) * self.crop_padding)
+            crop_top, crop_left = max(0, top - pad), max(0, left - pad)
+            crop_bottom, crop_right = min(height, bottom + pad), min(width, right + pad)
+            
+            rgb_crop = cv2.cvtColor(frame[crop_top:crop_bottom, crop_left:crop_right], cv2.COLOR_BGR2RGB)
+            local_box = (top - crop_top, right - crop_left, bottom - crop_top, left - crop_left)
+            encodings[i] = face_recognition.face_encodings(rgb_crop, [local_box], num_jitters=num_jitters)[0]
+        return encodings
+    
+    def match_faces(self, face_locations, face_encodings, use_full_gallery=False, camera_id=None) -> List[Dict]:
+        """
+        Match already-computed face encodings against the gallery
+        
+        Args:
+            face_locations: (top, right, bottom, left) boxes
+            face_encodings: Encodings aligned with face_locations
+            use_full_gallery: Match against every enrolled student even when
+                a session roster is registered
+            camera_id: Camera whose session roster applies (None = full gallery)
+        
+        Returns:
+            List of dicts with student_id, name, confidence, bbox
+        """
+        if len(face_locations) == 0:
+            return []
         
         results = []
         
@@ -201,26 +620,22 @@ class FaceDetector:
         tolerance = 0.6
         aligned_confidence_threshold = 1 - tolerance
         
-        for (top, right, bottom, left), face_encoding in zip(valid_faces, face_encodings):
-            # Compare faces
-            face_distances = face_recognition.face_distance(
-                self.known_face_encodings, 
-                face_encoding
-            )
-            
+        # Score all faces against the session roster (or whole gallery) in one matrix operation
+        gallery = self._matching_gallery(use_full_gallery, camera_id)
+        matches = gallery.best_matches(np.asarray(face_encodings))
+        
+        for (top, right, bottom, left), (match_id, match_name, best_distance) in zip(face_locations, matches):
             name = "Unknown"
             student_id = None
             confidence = 0
             
-            if len(face_distances) > 0:
-                best_match_index = np.argmin(face_distances)
-                best_distance = face_distances[best_match_index]
+            if match_id is not None:
                 confidence = 1 - best_distance
                 
                 # Use single tolerance check (no double-filtering)
                 if best_distance <= tolerance:
-                    student_id = self.known_face_ids[best_match_index]
-                    name = self.known_face_names[best_match_index]
+                    student_id = match_id
+                    name = match_name
             
             results.append({
                 "student_id": student_id,
@@ -0,0 +1,303 @@
+"""
+Contiguous in-memory gallery of enrolled face encodings
+Keeps all encodings in one (N, 128) float32 matrix so a whole frame of
+faces can be matched against every student in a single matrix operation
+"""
+import threading
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from ann_index import IVFIndex
+
+ENCODING_DIM = 128
+
+
+class FaceGallery:
+    """Enrolled encodings stored as a contiguous float32 matrix with cached squared norms"""
+
+    def __init__(self, encodings=None, ids=None, names=None, initial_capacity: int = 256,
+                 ann_min_size: Optional[int] = None, ann_nprobe: int = 8):
+        """
+        Initialize gallery
+
+        Args:
+            encodings: Optional iterable of 128-d encodings
+            ids: Student IDs aligned with encodings
+            names: Student names aligned with encodings
+            initial_capacity: Number of rows to preallocate
+            ann_min_size: Gallery size from which matching goes through an
+                approximate IVF index (None = always exact)
+            ann_nprobe: IVF lists scanned per query (recall vs latency knob)
+        """
+        self.ann_min_size = ann_min_size
+        self.index: Optional[IVFIndex] = None
+        self._ann_nprobe = ann_nprobe
+        self.lock = threading.RLock()
+        self._matrix = np.zeros((initial_capacity, ENCODING_DIM), dtype=np.float32)
+        self._sq_norms = np.zeros(initial_capacity, dtype=np.float32)
+        self._size = 0
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        # Student ID -> row, kept in sync with ids for O(1) lookup/upsert/delete
+        self._row_of: Dict[str, int] = {}
+
+        if encodings is not None and len(encodings) > 0:
+            self.load(encodings, ids or [], names or [])
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, student_id) -> bool:
+        return str(student_id) in self._row_of
+
+    def row_of(self, student_id: str) -> Optional[int]:
+        """Row holding a student's encoding, or None if not enrolled"""
+        return self._row_of.get(str(student_id))
+
+    def lookup(self, student_id: str) -> Optional[Tuple[str, np.ndarray]]:
+        """
+        Get a student's name and encoding
+
+        Returns:
+            (name, 128-d float32 copy of the encoding) or None if not enrolled
+        """
+        with self.lock:
+            row = self._row_of.get(str(student_id))
+            if row is None:
+                return None
+            return self.names[row], self._matrix[row].copy()
+
+    def enrolled(self, student_ids: Iterable) -> Set[str]:
+        """Subset of student_ids that are enrolled, resolved with one set intersection"""
+        with self.lock:
+            return self._row_of.keys() & {str(sid) for sid in student_ids}
+
+    @property
+    def encodings(self) -> np.ndarray:
+        """(N, 128) float32 view over the enrolled encodings"""
+        return self._matrix[:self._size]
+
+    @property
+    def sq_norms(self) -> np.ndarray:
+        """(N,) float32 view over the cached squared norms"""
+        return self._sq_norms[:self._size]
+
+    def load(self, encodings, ids: List[str], names: List[str], copy: bool = True):
+        """
+        Replace gallery contents in one step
+
+        Args:
+            encodings: (N, 128) encodings
+            ids: Student IDs aligned with encodings
+            names: Student names aligned with encodings
+            copy: If False and encodings is already a contiguous float32 matrix
+                (e.g. a read-only memmap), use it directly; it is copied on the
+                first write
+        """
+        matrix = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        size = len(matrix)
+        with self.lock:
+            if not copy and matrix.flags.c_contiguous:
+                self._matrix = matrix
+                self._sq_norms = np.einsum('ij,ij->i', matrix, matrix).astype(np.float32)
+            else:
+                self._matrix = np.zeros((max(size, 16), ENCODING_DIM), dtype=np.float32)
+                self._sq_norms = np.zeros(len(self._matrix), dtype=np.float32)
+                self._matrix[:size] = matrix
+                self._sq_norms[:size] = np.einsum('ij,ij->i', matrix, matrix)
+            self._size = size
+            self.ids = [str(i) for i in ids]
+            self.names = list(names)
+            self._row_of = {sid: row for row, sid in enumerate(self.ids)}
+            self.index = None
+            self._update_index()
+
+    def _ensure_capacity(self, rows: int):
+        """
+        Grow backing storage geometrically so appends stay amortized O(1)
+        Also copies a read-only (memory-mapped) matrix before the first write
+        """
+        capacity = len(self._matrix)
+        if rows <= capacity and self._matrix.flags.writeable:
+            return
+        new_capacity = max(rows, capacity * 2, 16) if rows > capacity else capacity
+        matrix = np.zeros((new_capacity, ENCODING_DIM), dtype=np.float32)
+        sq_norms = np.zeros(new_capacity, dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        self._matrix = matrix
+        self._sq_norms = sq_norms
+
+    def upsert(self, student_id: str, name: str, encoding: np.ndarray) -> bool:
+        """
+        Insert or replace a student's encoding
+
+        Returns:
+            bool: True if an existing row was updated, False if a new row was added
+        """
+        student_id = str(student_id)
+        vector = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_DIM)
+        with self.lock:
+            row = self._row_of.get(student_id)
+            if row is not None:
+                self._ensure_capacity(self._size)
+                self.names[row] = name
+                updated = True
+            else:
+                self._ensure_capacity(self._size + 1)
+                row = self._size
+                self._size += 1
+                self.ids.append(student_id)
+                self.names.append(name)
+                self._row_of[student_id] = row
+                updated = False
+            self._matrix[row] = vector
+            self._sq_norms[row] = float(vector @ vector)
+            self._update_index(row)
+            return updated
+
+    def remove(self, student_id: str) -> bool:
+        """
+        Delete a student's encoding in O(1) by moving the last row into its slot
+
+        Returns:
+            bool: True if the student was enrolled and has been removed
+        """
+        student_id = str(student_id)
+        with self.lock:
+            row = self._row_of.pop(student_id, None)
+            if row is None:
+                return False
+            self._ensure_capacity(self._size)
+            last = self._size - 1
+            if self.index is not None:
+                self.index.remove(row)
+            if row != last:
+                moved_id = self.ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._sq_norms[row] = self._sq_norms[last]
+                self.ids[row] = moved_id
+                self.names[row] = self.names[last]
+                self._row_of[moved_id] = row
+                if self.index is not None:
+                    self.index.relabel(last, row)
+            self.ids.pop()
+            self.names.pop()
+            self._size = last
+            if self.ann_min_size is not None and self._size < self.ann_min_size:
+                self.index = None
+            return True
+
+    def _update_index(self, row: Optional[int] = None):
+        """Build, retrain or incrementally update the ANN index for the current size"""
+        if self.ann_min_size is None or self._size < self.ann_min_size:
+            self.index = None
+            return
+        if self.index is None:
+            self.index = IVFIndex(nprobe=self._ann_nprobe)
+        if self.index.needs_rebuild(self._size):
+            self.index.build(self.encodings)
+            print(f"🗂️ Built ANN index: {len(self.index.centroids)} lists over {self._size} encodings")
+        elif row is not None:
+            self.index.update(row, self._matrix[row])
+
+    @property
+    def ann_nprobe(self) -> int:
+        return self._ann_nprobe
+
+    @ann_nprobe.setter
+    def ann_nprobe(self, value: int):
+        self._ann_nprobe = max(1, int(value))
+        if self.index is not None:
+            self.index.nprobe = self._ann_nprobe
+
+    def distances(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Euclidean distances between every query and every gallery row
+
+        Args:
+            queries: (Q, 128) array of face encodings
+
+        Returns:
+            (Q, N) float32 distance matrix
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        with self.lock:
+            gallery = self.encodings
+            gallery_sq = self.sq_norms
+            # ||q - g||^2 = ||q||^2 + ||g||^2 - 2 q.g
+            sq = np.einsum('ij,ij->i', queries, queries)[:, None] + gallery_sq[None, :]
+            sq -= 2.0 * (queries @ gallery.T)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq)
+
+    def search(self, queries: np.ndarray, k: int = 1, exact: bool = False) -> List[List[Tuple[str, str, float]]]:
+        """
+        Top-k enrolled students for each query
+
+        Uses the ANN index when the gallery is large enough, otherwise (or
+        when exact=True) scores every row with one matrix operation.
+
+        Args:
+            queries: (Q, 128) array of face encodings
+            k: Number of neighbours per query
+            exact: Force brute-force search
+
+        Returns:
+            Per query, a list of up to k (student_id, name, distance) sorted by distance
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        with self.lock:
+            if self._size == 0 or len(queries) == 0:
+                return [[] for _ in range(len(queries))]
+            k = min(k, self._size)
+            if self.index is not None and not exact:
+                rows, dists = self.index.search(queries, k)
+            else:
+                all_dists = self.distances(queries)
+                rows = np.argpartition(all_dists, k - 1, axis=1)[:, :k]
+                dists = np.take_along_axis(all_dists, rows, axis=1)
+                order = np.argsort(dists, axis=1)
+                rows = np.take_along_axis(rows, order, axis=1)
+                dists = np.take_along_axis(dists, order, axis=1)
+            return [
+                [
+                    (self.ids[row], self.names[row], float(dist))
+                    for row, dist in zip(query_rows, query_dists) if row >= 0
+                ]
+                for query_rows, query_dists in zip(rows, dists)
+            ]
+
+    def best_matches(self, queries: np.ndarray) -> List[Tuple[Optional[str], Optional[str], float]]:
+        """
+        Find the closest enrolled student for each query in one batched step
+
+        Args:
+            queries: (Q, 128) array of face encodings
+
+        Returns:
+            List of (student_id, name, distance) per query; id/name are None
+            and distance is inf when no match is available
+        """
+        return [
+            neighbours[0] if neighbours else (None, None, float('inf'))
+            for neighbours in self.search(queries, k=1)
+        ]
+
+    def subset(self, student_ids) -> 'FaceGallery':
+        """
+        Build a gallery over only the given students
+
+        Args:
+            student_ids: Iterable of student IDs (e.g. a class roster)
+
+        Returns:
+            FaceGallery holding copies of the matching rows; IDs that are not
+            enrolled are skipped
+        """
+        with self.lock:
+            rows = sorted(self._row_of[sid] for sid in self.enrolled(student_ids))
+            return FaceGallery(
+                self._matrix[rows],
+                [self.ids[row] for row in rows],
+                [self.names[row] for row in rows]
+            )
@@ -0,0 +1,148 @@
+"""
+IoU face tracking between recognition passes
+Detection still runs on every pass (it is cheap on the downscaled frame),
+but each detected box is associated with a track from the previous pass by
+intersection-over-union. A track keeps the encoding it was last given, so
+only new faces, faces that moved noticeably since they were encoded, tracks
+whose identity is unknown or weak, and tracks whose encoding is older than
+the re-encode interval go through the expensive landmark + descriptor step.
+A seated lecture hall therefore costs roughly one encode per new face
+instead of one encode per face per pass.
+"""
+import itertools
+import os
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from motion_gate import box_outside_roi
+
+Box = Tuple[int, int, int, int]
+
+
+def box_iou(a: Box, b: Box) -> float:
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    inter_h = min(a[2], b[2]) - max(a[0], b[0])
+    inter_w = min(a[1], b[1]) - max(a[3], b[3])
+    if inter_h <= 0 or inter_w <= 0:
+        return 0.0
+    inter = inter_h * inter_w
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / float(area_a + area_b - inter)
+
+
+class Track:
+    """One face followed across passes"""
+
+    __slots__ = ("id", "box", "encoding", "encoded_box", "encoded_at", "result", "misses", "hits")
+
+    def __init__(self, track_id: int, box: Box):
+        self.id = track_id
+        self.box = box
+        self.encoding: Optional[np.ndarray] = None
+        self.encoded_box: Optional[Box] = None
+        self.encoded_at = 0.0
+        self.result: Optional[Dict] = None
+        self.misses = 0
+        # Consecutive fresh encodings that matched the same student
+        self.hits = 0
+
+    def set_encoding(self, encoding: np.ndarray, now: float):
+        self.encoding = encoding
+        self.encoded_box = self.box
+        self.encoded_at = now
+
+
+class FaceTracker:
+    """Associates detections with tracks and decides which faces need a fresh encoding"""
+
+    def __init__(self):
+        # Tracker configuration from environment
+        self.match_iou = float(os.getenv("TRACK_IOU", "0.3"))  # Minimum overlap to continue a track
+        self.moved_iou = float(os.getenv("TRACK_MOVED_IOU", "0.6"))  # Below this overlap with the encoded box, re-encode
+        self.min_confidence = float(os.getenv("TRACK_MIN_CONFIDENCE", "0.5"))  # Weaker identities are re-encoded every pass
+        self.confirm_hits = int(os.getenv("TRACK_CONFIRM_HITS", "3"))  # Agreeing fresh encodings before a track is trusted
+        self.reencode_interval = float(os.getenv("TRACK_REENCODE_INTERVAL", "30"))  # Seconds before a track is re-verified
+        self.max_misses = int(os.getenv("TRACK_MAX_MISSES", "2"))  # Passes a track survives without a detection
+
+        self.tracks: List[Track] = []
+        self._ids = itertools.count(1)
+
+    def update(self, locations: List[Box], roi: Optional[Tuple[float, float, float, float]] = None,
+               frame_shape: Optional[Tuple[int, ...]] = None) -> List[Track]:
+        """
+        Associate this pass's detections with existing tracks (greedy, highest IoU first)
+
+        Args:
+            locations: Detected (top, right, bottom, left) boxes in frame coordinates
+            roi: Region the detections were limited to (fractions); tracks outside it
+                were not looked for and are left untouched
+            frame_shape: Frame shape the boxes refer to (required with roi)
+
+        Returns:
+            Tracks aligned with locations (new tracks for unmatched detections)
+        """
+        assigned: List[Optional[Track]] = [None] * len(locations)
+        if self.tracks and locations:
+            ious = np.array([[box_iou(location, track.box) for track in self.tracks] for location in locations])
+            while True:
+                det_index, track_index = np.unravel_index(np.argmax(ious), ious.shape)
+                if ious[det_index, track_index] < self.match_iou:
+                    break
+                track = self.tracks[track_index]
+                track.box = locations[det_index]
+                track.misses = 0
+                assigned[det_index] = track
+                ious[det_index, :] = -1
+                ious[:, track_index] = -1
+
+        matched = {id(track) for track in assigned if track is not None}
+        survivors = []
+        for track in self.tracks:
+            if id(track) not in matched and (roi is None or not box_outside_roi(track.box, roi, frame_shape)):
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            survivors.append(track)
+        self.tracks = survivors
+
+        for index, location in enumerate(locations):
+            if assigned[index] is None:
+                track = Track(next(self._ids), location)
+                self.tracks.append(track)
+                assigned[index] = track
+        return assigned
+
+    def record(self, track: Track, result: Dict, fresh: bool):
+        """
+        Attach this pass's match to a track
+
+        Args:
+            track: Track the face belongs to
+            result: Match of the track's encoding in this pass
+            fresh: True if the encoding was computed in this pass (only fresh
+                encodings count towards confirming the track's identity)
+        """
+        if fresh:
+            same = track.result is not None and result["student_id"] == track.result["student_id"]
+            if result["student_id"] is None:
+                track.hits = 0
+            else:
+                track.hits = track.hits + 1 if same else 1
+        track.result = result
+
+    def needs_encoding(self, track: Track, now: float) -> bool:
+        """True for new, unconfirmed, moved, weakly identified or stale tracks"""
+        if track.encoding is None or track.result is None:
+            return True
+        if track.result["student_id"] is None or track.result["confidence"] < self.min_confidence:
+            return True
+        if track.hits < self.confirm_hits:
+            # One encoding could be a lucky mismatch: verify with independent ones first
+            return True
+        if box_iou(track.box, track.encoded_box) < self.moved_iou:
+            return True
+        return now - track.encoded_at >= self.reencode_interval
+
+    def visible(self) -> List[Track]:
+        """Tracks seen in the latest pass (or outside its region and seen before), with an encoding"""
+        return [track for track in self.tracks if track.misses == 0 and track.encoding is not None]
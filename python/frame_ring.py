@@ -0,0 +1,216 @@
+"""
+Preallocated ring of raw camera frame buffers
+The capture thread reads each frame straight into a free slot (readinto), so
+steady-state capture allocates nothing. Consumers lease the latest slot and
+use it zero-copy; a slot is only rewritten once every lease on it has been
+released. If every slot is leased the frame is read into a scratch buffer
+and dropped. Each slot remembers the sequence number of the frame it holds,
+so a frame from one ring can be paired with the same frame of another
+(e.g. detection-resolution and full-resolution streams).
+
+With shared=True the slots live in multiprocessing.shared_memory blocks so
+recognition worker processes can map a leased frame by name instead of
+receiving a pickled copy.
+"""
+import threading
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+
+
+class FrameLease:
+    """Read-only, reference-counted view of one ring slot (release when done)"""
+
+    __slots__ = ("ring", "index", "frame", "seq", "timestamp", "_released")
+
+    def __init__(self, ring: "FrameRing", index: int, frame: np.ndarray, seq: int, timestamp: float):
+        self.ring = ring
+        self.index = index
+        self.frame = frame
+        self.seq = seq
+        self.timestamp = timestamp
+        self._released = False
+
+    def release(self):
+        """Return the slot to the ring (idempotent)"""
+        if not self._released:
+            self._released = True
+            self.ring._release(self.index)
+
+    def __enter__(self) -> "FrameLease":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class FrameRing:
+    """Fixed pool of frame buffers with a latest-frame pointer and per-slot refcounts"""
+
+    def __init__(self, shape: Tuple[int, ...], slots: int = 6, shared: bool = False):
+        """
+        Initialize ring
+
+        Args:
+            shape: Frame shape, e.g. (1080, 1920, 3)
+            slots: Number of buffers; must cover the latest frame, the slot being
+                written and every lease consumers hold at once
+            shared: Allocate slots in shared memory (see shared_name)
+        """
+        self.shape = shape
+        self._shared_blocks: List[shared_memory.SharedMemory] = []
+        if shared:
+            nbytes = int(np.prod(shape))
+            self._shared_blocks = [shared_memory.SharedMemory(create=True, size=nbytes) for _ in range(slots)]
+            self.buffers: List[np.ndarray] = [
+                np.ndarray(shape, dtype=np.uint8, buffer=block.buf) for block in self._shared_blocks
+            ]
+        else:
+            self.buffers = [np.empty(shape, dtype=np.uint8) for _ in range(slots)]
+        self.byte_views = [memoryview(buffer).cast('B') for buffer in self.buffers]
+        self._read_only = []
+        for buffer in self.buffers:
+            view = buffer.view()
+            view.flags.writeable = False
+            self._read_only.append(view)
+        self.refcounts = [0] * slots
+        # Sequence number and capture time of the frame in each slot (-1 = empty or being written)
+        self.slot_seqs = [-1] * slots
+        self.slot_times = [0.0] * slots
+
+        self._scratch = np.empty(shape, dtype=np.uint8)
+        self.scratch_view = memoryview(self._scratch).cast('B')
+
+        self.condition = threading.Condition()
+        self.latest_index = -1
+        self.seq = 0
+        self.timestamp = 0.0
+        self.dropped = 0
+        self.closed = False
+        # Called (outside the lock) after every published frame, e.g. to wake a scheduler
+        self.listeners: List[Callable[[], None]] = []
+
+    @property
+    def frame_bytes(self) -> int:
+        return self._scratch.nbytes
+
+    @property
+    def shared(self) -> bool:
+        return bool(self._shared_blocks)
+
+    def shared_name(self, index: int) -> str:
+        """Shared memory block name of a slot (shared rings only)"""
+        return self._shared_blocks[index].name
+
+    def writable_slot(self) -> int:
+        """Claim the oldest slot nobody holds (not the latest, no leases), or -1 if all are busy"""
+        with self.condition:
+            free = [
+                index for index, count in enumerate(self.refcounts)
+                if count == 0 and index != self.latest_index
+            ]
+            if not free:
+                return -1
+            index = min(free, key=lambda i: self.slot_seqs[i])
+            self.slot_seqs[index] = -1
+            return index
+
+    def write_view(self, index: int) -> memoryview:
+        """Byte view to read a frame into (the scratch buffer for index -1)"""
+        return self.scratch_view if index < 0 else self.byte_views[index]
+
+    def publish(self, index: int, timestamp: float, seq: Optional[int] = None):
+        """
+        Make a filled slot the latest frame; a scratch frame (-1) is counted as dropped
+
+        Args:
+            index: Slot returned by writable_slot
+            timestamp: Capture time
+            seq: Explicit frame sequence number (defaults to the next one)
+        """
+        with self.condition:
+            if index < 0:
+                self.dropped += 1
+                return
+            # The ring itself holds one reference on the latest slot
+            if self.latest_index >= 0:
+                self.refcounts[self.latest_index] -= 1
+            self.latest_index = index
+            self.refcounts[index] += 1
+            self.seq = max(self.seq + 1, seq or 0)
+            self.slot_seqs[index] = self.seq
+            self.slot_times[index] = timestamp
+            self.timestamp = timestamp
+            self.condition.notify_all()
+        for listener in list(self.listeners):
+            listener()
+
+    def add_listener(self, listener: Callable[[], None]):
+        """Run listener() after every published frame"""
+        with self.condition:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[], None]):
+        with self.condition:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def _lease_locked(self) -> Optional[FrameLease]:
+        if self.latest_index < 0:
+            return None
+        self.refcounts[self.latest_index] += 1
+        return FrameLease(self, self.latest_index, self._read_only[self.latest_index], self.seq, self.timestamp)
+
+    def lease_seq(self, seq: int, timeout: float) -> Optional[FrameLease]:
+        """Lease the frame with sequence number seq, waiting for it to arrive; None if dropped or overwritten"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq >= seq or self.closed, timeout=timeout)
+            for index, slot_seq in enumerate(self.slot_seqs):
+                if slot_seq == seq:
+                    self.refcounts[index] += 1
+                    return FrameLease(self, index, self._read_only[index], seq, self.slot_times[index])
+            return None
+
+    def lease_latest(self) -> Optional[FrameLease]:
+        """Lease the latest frame (None before the first frame)"""
+        with self.condition:
+            return self._lease_locked()
+
+    def wait_for_lease(self, after_seq: int, timeout: float) -> Optional[FrameLease]:
+        """Lease the latest frame once it is newer than after_seq; None on timeout or close"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq > after_seq or self.closed, timeout=timeout)
+            if self.seq <= after_seq:
+                return None
+            return self._lease_locked()
+
+    def _release(self, index: int):
+        with self.condition:
+            self.refcounts[index] -= 1
+
+    def close(self):
+        """Wake every waiter (stream stopped)"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def reopen(self):
+        with self.condition:
+            self.closed = False
+
+    def free_shared_memory(self):
+        """Unlink shared slots once the stream is stopped (mapped readers keep their view)"""
+        if not self._shared_blocks:
+            return
+        # Drop our own views before closing the mappings
+        self.buffers, self.byte_views, self._read_only = [], [], []
+        for block in self._shared_blocks:
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+            try:
+                block.close()
+            except BufferError:
+                pass  # A lease is still out; the mapping goes away with its last view
+        self._shared_blocks = []
@@ -0,0 +1,158 @@
+"""
+Encode-once MJPEG broadcast for /video_feed
+A single render thread per hub draws the recognition overlays, resizes and
+JPEG-encodes each new camera frame once; every subscriber is handed the same
+bytes. Subscribers always pick up the newest JPEG, so a slow client skips
+frames instead of building a backlog, and the render cost does not grow
+with the number of viewers.
+"""
+import threading
+from typing import Callable, Iterator, Optional, Tuple
+import cv2
+import numpy as np
+
+OUTPUT_SIZE = (960, 540)
+JPEG_QUALITY = 70
+
+
+def draw_results(frame: np.ndarray, results, scale: float = 1.0):
+    """
+    Draw recognition boxes and labels onto frame in place
+
+    Args:
+        frame: Image to draw on
+        results: Recognition results with bboxes in camera-frame coordinates
+        scale: Factor from camera-frame to frame coordinates (frame already resized)
+    """
+    thickness = max(1, round(2 * scale))
+    for result in results:
+        bbox = {key: int(value * scale) for key, value in result['bbox'].items()}
+        name = result['name']
+        confidence = result['confidence']
+
+        color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
+        cv2.rectangle(frame,
+                      (bbox['left'], bbox['top']),
+                      (bbox['right'], bbox['bottom']),
+                      color, thickness)
+
+        label = f"{name} ({confidence*100:.0f}%)" if name != "Unknown" else "Unknown"
+        cv2.putText(frame, label,
+                    (bbox['left'], bbox['top'] - int(10 * scale)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6 * scale, color, thickness)
+
+
+def placeholder_frame(text: str, x: int) -> np.ndarray:
+    """Black frame with a status message"""
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    cv2.putText(frame, text, (x, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    return frame
+
+
+class MjpegHub:
+    """Renders annotated JPEGs once and fans them out to all /video_feed subscribers"""
+
+    def __init__(self, worker_provider: Callable, use_full_gallery: bool = False):
+        """
+        Initialize hub
+
+        Args:
+            worker_provider: Returns the camera's current RecognitionWorker (or None)
+            use_full_gallery: Label faces against the whole gallery instead of the session roster
+        """
+        self.worker_provider = worker_provider
+        self.use_full_gallery = use_full_gallery
+
+        self.condition = threading.Condition()
+        self.subscribers = 0
+        self._thread: Optional[threading.Thread] = None
+
+        self._jpeg: Optional[bytes] = None
+        self._jpeg_seq = 0
+
+    def _subscribe(self):
+        with self.condition:
+            self.subscribers += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._render_loop, daemon=True)
+                self._thread.start()
+
+    def _unsubscribe(self):
+        with self.condition:
+            self.subscribers -= 1
+            self.condition.notify_all()
+
+    def _render_loop(self):
+        """Render each new frame once; exits when the last subscriber leaves"""
+        frame_seq = 0
+        result_seq = 0
+        results = []
+        while True:
+            with self.condition:
+                if self.subscribers <= 0:
+                    self._thread = None
+                    return
+
+            try:
+                worker = self.worker_provider()
+                if worker is None or not worker.running:
+                    frame = placeholder_frame('Camera Unavailable', 180)
+                    self._publish(frame)
+                    with self.condition:
+                        self.condition.wait(timeout=1)
+                    continue
+
+                lease = worker.camera_stream.wait_for_lease(frame_seq, timeout=1)
+                if lease is None:
+                    if worker.camera_stream.frame_seq == 0:
+                        self._publish(placeholder_frame('Connecting...', 220))
+                    continue
+                frame_seq = lease.seq
+
+                result = worker.latest()
+                if result is not None and result.seq != result_seq:
+                    result_seq = result.seq
+                    results = worker.results_for(result, self.use_full_gallery)
+
+                # Downscale straight from the leased buffer, then draw on the small copy
+                with lease:
+                    scale = OUTPUT_SIZE[0] / lease.frame.shape[1]
+                    frame = cv2.resize(lease.frame, OUTPUT_SIZE)
+                draw_results(frame, results, scale)
+                self._publish(frame)
+            except Exception as e:
+                print(f"Video feed error: {e}")
+                with self.condition:
+                    self.condition.wait(timeout=1)
+
+    def _publish(self, frame: np.ndarray):
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if not ret:
+            return
+        with self.condition:
+            self._jpeg = buffer.tobytes()
+            self._jpeg_seq += 1
+            self.condition.notify_all()
+
+    def wait_for_jpeg(self, after_seq: int, timeout: float) -> Tuple[int, Optional[bytes]]:
+        """Block until a JPEG newer than after_seq is rendered (or timeout)"""
+        with self.condition:
+            self.condition.wait_for(lambda: self._jpeg_seq > after_seq, timeout=timeout)
+            return self._jpeg_seq, self._jpeg
+
+    def stream(self) -> Iterator[bytes]:
+        """multipart/x-mixed-replace body for one subscriber"""
+        self._subscribe()
+        try:
+            last_seq = 0
+            while True:
+                seq, jpeg = self.wait_for_jpeg(last_seq, timeout=5)
+                if jpeg is None or seq == last_seq:
+                    continue
+                last_seq = seq
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+        except GeneratorExit:
+            print("Video feed closed by client")
+        finally:
+            self._unsubscribe()
@@ -0,0 +1,144 @@
+"""
+Motion gate for recognition passes
+Each new frame is shrunk to a small blurred grayscale thumbnail and diffed
+against the thumbnail of the last frame that was recognized. The difference
+is split into a grid of regions; only regions where enough pixels changed
+count as active. A static scene skips recognition entirely (the previous
+result stays published), motion confined to a few regions re-detects just
+their bounding box, and a periodic full pass catches anything the gate
+missed (slow drift, lighting changes, roster changes).
+"""
+import os
+from typing import List, Optional, Tuple
+import cv2
+import numpy as np
+
+# Analysis thumbnail width and region grid (columns x rows)
+ANALYSIS_WIDTH = 160
+GRID_COLS = 8
+GRID_ROWS = 6
+
+# Motion covering more than this fraction of the frame is re-detected in full
+FULL_PASS_AREA = 0.5
+
+
+def expand_roi(roi: Tuple[float, float, float, float], boxes: List[Tuple[int, int, int, int]],
+               frame_shape: Tuple[int, ...]) -> Tuple[float, float, float, float]:
+    """
+    Grow a region of interest to cover every face box it overlaps
+
+    A face straddling the edge of the moving area would otherwise be cut in
+    half by the crop and neither re-detected nor kept.
+
+    Args:
+        roi: (top, right, bottom, left) as fractions of the frame
+        boxes: (top, right, bottom, left) face boxes in frame pixels
+        frame_shape: Shape of the frame the boxes refer to
+
+    Returns:
+        Expanded (top, right, bottom, left) fractions
+    """
+    height, width = frame_shape[:2]
+    fractions = [(t / height, r / width, b / height, l / width) for t, r, b, l in boxes]
+    top, right, bottom, left = roi
+    grown = True
+    while grown:
+        # Repeat until stable: covering one face can pull in a neighbour it overlaps
+        grown = False
+        for box_top, box_right, box_bottom, box_left in fractions:
+            overlaps = box_left < right and box_right > left and box_top < bottom and box_bottom > top
+            inside = box_top >= top and box_right <= right and box_bottom <= bottom and box_left >= left
+            if overlaps and not inside:
+                top, right = min(top, box_top), max(right, box_right)
+                bottom, left = max(bottom, box_bottom), min(left, box_left)
+                grown = True
+    return max(0.0, top), min(1.0, right), min(1.0, bottom), max(0.0, left)
+
+
+def box_outside_roi(box: Tuple[int, int, int, int], roi: Tuple[float, float, float, float],
+                    frame_shape: Tuple[int, ...]) -> bool:
+    """True if a face box (frame pixels) does not overlap the region of interest (fractions)"""
+    height, width = frame_shape[:2]
+    top, right, bottom, left = box
+    return (
+        right / width <= roi[3] or left / width >= roi[1]
+        or bottom / height <= roi[0] or top / height >= roi[2]
+    )
+
+
+class MotionGate:
+    """Decides per frame whether (and where) a camera needs a new recognition pass"""
+
+    def __init__(self):
+        # Gate configuration from environment
+        self.pixel_threshold = int(os.getenv("MOTION_THRESHOLD", "25"))  # Gray-level change that counts as motion
+        self.cell_fraction = float(os.getenv("MOTION_CELL_FRACTION", "0.02"))  # Changed pixels that make a region active
+        self.refresh_interval = float(os.getenv("MOTION_REFRESH_INTERVAL", "5"))  # Seconds between forced full passes
+
+        self._reference: Optional[np.ndarray] = None
+        self._last_full = 0.0
+
+        # Counters for logging/diagnostics
+        self.skipped = 0
+        self.partial = 0
+        self.full = 0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        size = (ANALYSIS_WIDTH, max(GRID_ROWS, round(height * ANALYSIS_WIDTH / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            # Channel order doesn't matter: every thumbnail of a camera is converted the same way
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def active_regions(self, thumbnail: np.ndarray) -> np.ndarray:
+        """(GRID_ROWS, GRID_COLS) bool mask of regions that changed since the reference"""
+        changed = cv2.absdiff(thumbnail, self._reference) > self.pixel_threshold
+        height, width = changed.shape
+        cell_h, cell_w = height // GRID_ROWS, width // GRID_COLS
+        cells = changed[:cell_h * GRID_ROWS, :cell_w * GRID_COLS].reshape(GRID_ROWS, cell_h, GRID_COLS, cell_w)
+        return cells.mean(axis=(1, 3)) > self.cell_fraction
+
+    def check(self, frame: np.ndarray, now: float,
+              force_full: bool = False) -> Tuple[bool, Optional[Tuple[float, float, float, float]]]:
+        """
+        Compare a frame with the last recognized one
+
+        Args:
+            frame: Frame about to be recognized (any resolution, BGR/RGB or gray)
+            now: Monotonic time
+            force_full: Run a full pass regardless of motion (e.g. a reader needs a fresh result)
+
+        Returns:
+            (run, roi) - run is False when nothing moved (reuse the previous
+            result); roi is None for a full pass, otherwise the
+            (top, right, bottom, left) fractions of the frame to re-detect
+        """
+        thumbnail = self._thumbnail(frame)
+        if force_full or self._reference is None or self._reference.shape != thumbnail.shape \
+                or now - self._last_full >= self.refresh_interval:
+            self._reference = thumbnail
+            self._last_full = now
+            self.full += 1
+            return True, None
+
+        active = self.active_regions(thumbnail)
+        if not active.any():
+            self.skipped += 1
+            return False, None
+
+        self._reference = thumbnail
+        rows = np.flatnonzero(active.any(axis=1))
+        cols = np.flatnonzero(active.any(axis=0))
+        # One region of margin so faces entering from a neighbouring region are caught whole
+        top = max(0, rows[0] - 1) / GRID_ROWS
+        bottom = min(GRID_ROWS, rows[-1] + 2) / GRID_ROWS
+        left = max(0, cols[0] - 1) / GRID_COLS
+        right = min(GRID_COLS, cols[-1] + 2) / GRID_COLS
+        if (bottom - top) * (right - left) > FULL_PASS_AREA:
+            self._last_full = now
+            self.full += 1
+            return True, None
+        self.partial += 1
+        return True, (float(top), float(right), float(bottom), float(left))
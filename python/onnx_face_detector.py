@@ -0,0 +1,217 @@
+"""
+ONNX Runtime face detector (YOLOv8-face without the ultralytics/torch stack)
+The .pt model is exported to ONNX once (the only step that needs ultralytics);
+optionally a static int8 copy is produced from a folder of calibration
+frames. Inference runs on onnxruntime with numpy/OpenCV pre- and
+post-processing and returns the same (top, right, bottom, left) boxes as
+YOLOFaceDetector.
+"""
+import glob
+import os
+from typing import List, Optional, Tuple
+import cv2
+import numpy as np
+
+LETTERBOX_COLOR = 114
+NMS_IOU = 0.45
+CALIBRATION_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def letterbox(image: np.ndarray, size: int) -> Tuple[np.ndarray, float, int, int]:
+    """
+    Resize keeping the aspect ratio and pad to a size x size square
+
+    Returns:
+        (padded image, scale, pad_x, pad_y) to map boxes back to the input
+    """
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_w, new_h = round(width * scale), round(height * scale)
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    padded = np.full((size, size, 3), LETTERBOX_COLOR, dtype=np.uint8)
+    padded[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    return padded, scale, pad_x, pad_y
+
+
+def to_input_tensor(images: List[np.ndarray]) -> np.ndarray:
+    """Letterboxed HWC uint8 images -> NCHW float32 in [0, 1]"""
+    return np.ascontiguousarray(np.stack(images).transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+
+
+def export_onnx(source_model: str, onnx_path: str, imgsz: int = 640) -> str:
+    """One-time export of a YOLO .pt model to ONNX with a dynamic batch axis (needs ultralytics)"""
+    try:
+        from ultralytics import YOLO
+    except ImportError:
+        raise ImportError(
+            f"{onnx_path} not found and ultralytics is not installed to export it. "
+            "Export once elsewhere with: yolo export model=yolov8n-face.pt format=onnx dynamic=True"
+        )
+    print(f"📦 Exporting {source_model} to ONNX (one-time)")
+    exported = YOLO(source_model).export(format="onnx", imgsz=imgsz, dynamic=True)
+    if os.path.abspath(exported) != os.path.abspath(onnx_path):
+        os.replace(exported, onnx_path)
+    return onnx_path
+
+
+def quantize_int8(onnx_path: str, int8_path: str, calibration_dir: str, imgsz: int = 640, max_images: int = 200) -> str:
+    """
+    Static int8 (QDQ) quantization calibrated on frames from calibration_dir
+
+    Args:
+        onnx_path: Float32 model
+        int8_path: Output path of the quantized model
+        calibration_dir: Folder of representative camera frames (jpg/png)
+        imgsz: Model input size
+        max_images: Calibration frames to use
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    import onnxruntime as ort
+
+    paths = sorted(path for pattern in CALIBRATION_PATTERNS for path in glob.glob(os.path.join(calibration_dir, pattern)))
+    if not paths:
+        raise ValueError(f"No calibration images (*.jpg, *.png) in {calibration_dir}")
+    paths = paths[:max_images]
+    input_name = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter(paths)
+
+        def get_next(self):
+            for path in self.paths:
+                image = cv2.imread(path)
+                if image is not None:
+                    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+                    return {input_name: to_input_tensor([letterbox(rgb, imgsz)[0]])}
+            return None
+
+    print(f"🧮 Quantizing {onnx_path} to int8 with {len(paths)} calibration frames")
+    quantize_static(
+        onnx_path, int8_path, FrameReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True
+    )
+    return int8_path
+
+
+class ONNXFaceDetector:
+    """YOLOv8-face on ONNX Runtime; drop-in for YOLOFaceDetector (detect, detect_batch, detect_largest)"""
+
+    def __init__(self, model_path: str = "yolov8n-face.onnx", source_model: str = "yolov8n-face.pt",
+                 calibration_dir: Optional[str] = None, device: str = "cpu", threads: int = 0, imgsz: int = 640):
+        """
+        Initialize ONNX face detector (exports/quantizes on first use)
+
+        Args:
+            model_path: Float32 ONNX model; exported from source_model if missing
+            source_model: YOLO .pt model to export from
+            calibration_dir: Folder of camera frames; if set, a static int8 model
+                (<model>.int8.onnx) is built once and used instead
+            device: 'cpu' or 'cuda' (CUDA execution provider if available)
+            threads: Intra-op threads (0 = onnxruntime default)
+            imgsz: Model input size
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("ONNX Runtime not installed. Install with: pip install onnxruntime")
+
+        self.imgsz = imgsz
+        if not os.path.exists(model_path):
+            export_onnx(source_model, model_path, imgsz)
+        if calibration_dir:
+            int8_path = f"{os.path.splitext(model_path)[0]}.int8.onnx"
+            if not os.path.exists(int8_path):
+                quantize_int8(model_path, int8_path, calibration_dir, imgsz)
+            model_path = int8_path
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        providers = ["CPUExecutionProvider"]
+        if device == "cuda" and "CUDAExecutionProvider" in ort.get_available_providers():
+            providers.insert(0, "CUDAExecutionProvider")
+
+        print(f"🤖 Loading ONNX face detector: {model_path} ({providers[0]})")
+        self.session = ort.InferenceSession(model_path, options, providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Exports without a dynamic batch axis run one image per call
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        self.model_path = model_path
+        print(f"✅ ONNX face detector loaded ({'batched' if self.dynamic_batch else 'single-image'} input)")
+
+    def detect(self, frame: np.ndarray, conf_threshold: float = 0.5) -> List[Tuple[int, int, int, int]]:
+        """
+        Detect faces in frame
+
+        Args:
+            frame: RGB image (as FaceDetector passes them)
+            conf_threshold: Minimum confidence for detection
+
+        Returns:
+            List of face bounding boxes as (top, right, bottom, left) tuples
+        """
+        return self.detect_batch([frame], conf_threshold)[0]
+
+    def detect_batch(self, frames: List[np.ndarray], conf_threshold: float = 0.5,
+                     batch_size: int = 16) -> List[List[Tuple[int, int, int, int]]]:
+        """
+        Detect faces in several images with one inference call per batch_size images
+
+        Args:
+            frames: RGB images, which may differ in size
+            conf_threshold: Minimum confidence for detection
+            batch_size: Maximum images per inference call
+
+        Returns:
+            One list of (top, right, bottom, left) boxes per input image
+        """
+        if not self.dynamic_batch:
+            batch_size = 1
+        face_locations = []
+        for start in range(0, len(frames), batch_size):
+            chunk = frames[start:start + batch_size]
+            boxed = [letterbox(frame, self.imgsz) for frame in chunk]
+            output = self.session.run(None, {self.input_name: to_input_tensor([item[0] for item in boxed])})[0]
+            for frame, (_, scale, pad_x, pad_y), prediction in zip(chunk, boxed, output):
+                face_locations.append(self._postprocess(prediction, frame.shape, scale, pad_x, pad_y, conf_threshold))
+        return face_locations
+
+    @staticmethod
+    def _postprocess(prediction: np.ndarray, shape: Tuple[int, ...], scale: float, pad_x: int, pad_y: int,
+                     conf_threshold: float) -> List[Tuple[int, int, int, int]]:
+        """
+        Decode one image's raw output (channels x anchors: cx, cy, w, h, score[, keypoints])
+        into NMS-filtered (top, right, bottom, left) boxes in input-image pixels
+        """
+        scores = prediction[4]
+        keep = scores >= conf_threshold
+        if not keep.any():
+            return []
+        cx, cy, w, h = prediction[:4, keep]
+        scores = scores[keep]
+
+        # Undo the letterbox, then clip to the image
+        height, width = shape[:2]
+        left = np.clip((cx - w / 2 - pad_x) / scale, 0, width)
+        top = np.clip((cy - h / 2 - pad_y) / scale, 0, height)
+        right = np.clip((cx + w / 2 - pad_x) / scale, 0, width)
+        bottom = np.clip((cy + h / 2 - pad_y) / scale, 0, height)
+
+        rects = np.stack([left, top, right - left, bottom - top], axis=1)
+        indices = cv2.dnn.NMSBoxes(rects.tolist(), scores.tolist(), conf_threshold, NMS_IOU)
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        boxes = np.stack([top, right, bottom, left], axis=1)[indices].astype(np.int32)
+        return [tuple(box) for box in boxes.tolist()]
+
+    def detect_largest(self, frame: np.ndarray, conf_threshold: float = 0.5) -> Optional[Tuple[int, int, int, int]]:
+        """Detect and return the largest face in frame, or None"""
+        face_locations = self.detect(frame, conf_threshold)
+        if not face_locations:
+            return None
+        return max(face_locations, key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3]))
@@ -0,0 +1,201 @@
+"""
+Content-addressed on-disk cache of student photos
+Photos are stored by SHA-256 of their bytes; each student entry remembers the
+ETag/Last-Modified validators of the download and the hash of the photo their
+current gallery embedding came from, so unchanged photos are neither
+re-downloaded nor re-encoded. Blobs are evicted least-recently-used once the
+cache exceeds its size budget.
+
+Layout:
+    <dir>/index.json         students + blobs metadata
+    <dir>/blobs/ab/<sha256>  photo bytes
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class PhotoCache:
+    """SHA-256 keyed photo store with HTTP validators, embedding provenance and LRU eviction"""
+
+    def __init__(self, directory: str = "encodings/photo_cache", max_bytes: int = 500 * 1024 * 1024):
+        """
+        Initialize cache
+
+        Args:
+            directory: Cache root directory
+            max_bytes: Total blob size above which least-recently-used blobs are evicted
+        """
+        self.directory = directory
+        self.blob_dir = os.path.join(directory, "blobs")
+        self.index_path = os.path.join(directory, "index.json")
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._dirty = False
+
+        # student_id -> {"hash", "etag", "last_modified", "embedded_hash"}
+        self.students: Dict[str, Dict] = {}
+        # sha256 -> {"size", "last_access"}
+        self.blobs: Dict[str, Dict] = {}
+        self.total_bytes = 0
+
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            self.students = index.get("students", {})
+            self.blobs = {
+                digest: meta for digest, meta in index.get("blobs", {}).items()
+                if os.path.exists(self._blob_path(digest))
+            }
+            self.total_bytes = sum(meta["size"] for meta in self.blobs.values())
+            print(f"🗃️ Photo cache: {len(self.blobs)} photos, {self.total_bytes / 1e6:.1f} MB")
+        except Exception as e:
+            print(f"⚠️ Photo cache index unreadable, starting empty: {e}")
+            self.students, self.blobs, self.total_bytes = {}, {}, 0
+
+    def save(self):
+        """Persist the index if it changed (temp file + rename)"""
+        with self.lock:
+            if not self._dirty:
+                return
+            payload = json.dumps({"students": self.students, "blobs": self.blobs})
+            self._dirty = False
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_path, self.index_path)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _read_blob(self, digest: str) -> Optional[bytes]:
+        """Read a cached photo and mark it recently used"""
+        try:
+            with open(self._blob_path(digest), 'rb') as f:
+                data = f.read()
+        except OSError:
+            with self.lock:
+                meta = self.blobs.pop(digest, None)
+                if meta is not None:
+                    self.total_bytes -= meta["size"]
+                    self._dirty = True
+            return None
+        with self.lock:
+            if digest in self.blobs:
+                self.blobs[digest]["last_access"] = time.time()
+                self._dirty = True
+        return data
+
+    def _put_blob(self, data: bytes) -> str:
+        """Store photo bytes under their SHA-256 and evict LRU blobs over budget"""
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            if digest in self.blobs:
+                self.blobs[digest]["last_access"] = time.time()
+                self._dirty = True
+                return digest
+
+        path = self._blob_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            if digest not in self.blobs:
+                self.blobs[digest] = {"size": len(data), "last_access": time.time()}
+                self.total_bytes += len(data)
+            self._dirty = True
+            self._evict(keep=digest)
+        return digest
+
+    def _evict(self, keep: str):
+        """Drop least-recently-used blobs until under budget (caller holds lock)"""
+        if self.total_bytes <= self.max_bytes:
+            return
+        for digest, meta in sorted(self.blobs.items(), key=lambda item: item[1]["last_access"]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            try:
+                os.remove(self._blob_path(digest))
+            except OSError:
+                pass
+            del self.blobs[digest]
+            self.total_bytes -= meta["size"]
+
+    def fetch(self, session, student_id: str, url: str, min_bytes: int = 0,
+              timeout: float = 15) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
+        """
+        Download a student's photo, revalidating against the cached copy
+
+        Sends If-None-Match / If-Modified-Since when validators are known; a
+        304 response is served from the cache.
+
+        Args:
+            session: requests.Session to download with
+            student_id: Student ID
+            url: Photo URL
+            min_bytes: Responses this small are treated as missing photos
+
+        Returns:
+            (photo_bytes, sha256, None) on success, (None, None, reason) on failure
+        """
+        with self.lock:
+            entry = dict(self.students.get(student_id, {}))
+            cached_hash = entry.get("hash")
+            have_blob = cached_hash in self.blobs
+
+        headers = {}
+        if have_blob:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = session.get(url, headers=headers, timeout=timeout)
+            if response.status_code == 304:
+                data = self._read_blob(cached_hash)
+                if data is not None:
+                    print(f"  Download {student_id}: 304 not modified (cached)")
+                    return data, cached_hash, None
+                # Blob evicted between checks; fetch unconditionally
+                response = session.get(url, timeout=timeout)
+        except Exception as e:
+            return None, None, str(e)
+
+        print(f"  Download {student_id}: {response.status_code}, size: {len(response.content)} bytes")
+        if response.status_code != 200 or len(response.content) <= min_bytes:
+            return None, None, f"Download failed: status={response.status_code}, size={len(response.content)}"
+
+        digest = self._put_blob(response.content)
+        with self.lock:
+            record = self.students.setdefault(student_id, {})
+            record["hash"] = digest
+            record["etag"] = response.headers.get("ETag")
+            record["last_modified"] = response.headers.get("Last-Modified")
+            self._dirty = True
+        return response.content, digest, None
+
+    def embedded_hash(self, student_id: str) -> Optional[str]:
+        """Hash of the photo the student's current gallery embedding was computed from"""
+        with self.lock:
+            return self.students.get(student_id, {}).get("embedded_hash")
+
+    def mark_embedded(self, student_id: str, photo_hash: str):
+        """Record that the gallery embedding now comes from photo_hash"""
+        with self.lock:
+            self.students.setdefault(student_id, {})["embedded_hash"] = photo_hash
+            self._dirty = True
@@ -0,0 +1,168 @@
+"""
+Multi-process face detection/encoding over shared-memory frames
+The capture thread writes frames into shared-memory ring slots; recognition
+passes hand worker processes only the slot names, and each worker maps the
+frame zero-copy, runs detection or encoding with its own preloaded
+FaceDetector and returns the face boxes or 128-d encodings. Frames are never
+pickled, and tracking and matching stay in the parent where the tracks,
+gallery and session roster live.
+"""
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+import numpy as np
+
+# Shared-memory mappings kept open per worker process (slot names change when a camera restarts)
+MAX_ATTACHED_BLOCKS = 64
+
+# Detector instance and attached frame blocks owned by each worker process
+_worker_detector = None
+_attached: "OrderedDict[str, Tuple[shared_memory.SharedMemory, np.ndarray]]" = OrderedDict()
+
+
+def _init_recognition_worker():
+    """Process pool initializer: load a detect/encode-only FaceDetector once per worker"""
+    global _worker_detector
+    from face_detector import FaceDetector
+    _worker_detector = FaceDetector(load_gallery=False)
+
+
+def _attach(name: str, shape: Tuple[int, ...]) -> np.ndarray:
+    """Map a frame slot by name, reusing the mapping for later frames in the same slot"""
+    entry = _attached.get(name)
+    if entry is None:
+        try:
+            block = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:  # Python < 3.13 has no track flag
+            block = shared_memory.SharedMemory(name=name)
+        entry = (block, np.ndarray(shape, dtype=np.uint8, buffer=block.buf))
+        _attached[name] = entry
+        while len(_attached) > MAX_ATTACHED_BLOCKS:
+            _, (old_block, old_frame) = _attached.popitem(last=False)
+            del old_frame
+            try:
+                old_block.close()
+            except BufferError:
+                pass
+    else:
+        _attached.move_to_end(name)
+    return entry[1]
+
+
+def _locate_in_worker(frame_ref: Tuple[str, Tuple[int, ...]],
+                      detection_ref: Optional[Tuple[str, Tuple[int, ...]]],
+                      roi: Optional[Tuple[float, float, float, float]] = None) -> List[Tuple[int, int, int, int]]:
+    frame = _attach(*frame_ref)
+    detection_frame = _attach(*detection_ref) if detection_ref is not None else None
+    locations = _worker_detector.detect_face_locations(frame, detection_frame=detection_frame, roi=roi)
+    return [tuple(int(v) for v in loc) for loc in locations]
+
+
+def _coarse_in_worker(frame_ref: Tuple[str, Tuple[int, ...]],
+                      detection_ref: Optional[Tuple[str, Tuple[int, ...]]],
+                      roi: Optional[Tuple[float, float, float, float]] = None) -> List[Tuple[int, int, int, int]]:
+    frame = _attach(*frame_ref)
+    detection_frame = _attach(*detection_ref) if detection_ref is not None else None
+    locations = _worker_detector.detect_coarse(frame, detection_frame=detection_frame, roi=roi)
+    return [tuple(int(v) for v in loc) for loc in locations]
+
+
+def _tiles_in_worker(frame_ref: Tuple[str, Tuple[int, ...]],
+                     tiles: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+    locations = _worker_detector.detect_in_tiles(_attach(*frame_ref), tiles)
+    return [tuple(int(v) for v in loc) for loc in locations]
+
+
+def _encode_in_worker(frame_ref: Tuple[str, Tuple[int, ...]], locations: List[Tuple[int, int, int, int]]) -> np.ndarray:
+    return _worker_detector.encode_face_crops(_attach(*frame_ref), locations)
+
+
+def _slot_ref(lease) -> Tuple[str, Tuple[int, ...]]:
+    return lease.ring.shared_name(lease.index), lease.ring.shape
+
+
+class RecognitionProcessPool:
+    """Pool of detector processes that detect and encode faces in shared-memory frames"""
+
+    def __init__(self, processes: int):
+        """
+        Initialize pool (processes start lazily on the first frame)
+
+        Args:
+            processes: Worker processes (RECOGNITION_PROCESSES)
+        """
+        self.processes = processes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Spawned (not forked) so workers don't inherit Flask threads or the parent's gallery"""
+        with self._pool_lock:
+            if self._pool is None:
+                print(f"⚙️ Starting {self.processes} recognition processes")
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_recognition_worker
+                )
+            return self._pool
+
+    def _reset_pool(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _run(self, fn, *args):
+        try:
+            return self._get_pool().submit(fn, *args).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. native crash); start a fresh pool for the next pass
+            self._reset_pool()
+            raise
+
+    def detect_face_locations(self, frame_lease, detection_lease=None, roi=None) -> List[Tuple[int, int, int, int]]:
+        """
+        Detect faces in leased shared-memory frames (blocks until done)
+
+        Args:
+            frame_lease: Full-resolution BGR frame lease from a shared ring
+            detection_lease: Optional detection-resolution RGB lease of the same frame
+            roi: Optional (top, right, bottom, left) fractions of the frame to detect in
+
+        Returns:
+            Face boxes as from FaceDetector.detect_face_locations
+        """
+        detection_ref = _slot_ref(detection_lease) if detection_lease is not None else None
+        return self._run(_locate_in_worker, _slot_ref(frame_lease), detection_ref, roi)
+
+    def detect_tiled(self, frame_lease, detection_lease, roi,
+                     tile_groups: List[List[Tuple[int, int, int, int]]]) -> List[Tuple[int, int, int, int]]:
+        """
+        Run the coarse pass and each group of full-resolution tiles as separate jobs spread over the pool
+        (one tile per job for per-image backends, all tiles in one batched job for YOLO)
+
+        Returns:
+            Raw boxes from all jobs (merge with FaceDetector.merge_detections)
+        """
+        frame_ref = _slot_ref(frame_lease)
+        detection_ref = _slot_ref(detection_lease) if detection_lease is not None else None
+        try:
+            pool = self._get_pool()
+            futures = [pool.submit(_coarse_in_worker, frame_ref, detection_ref, roi)]
+            futures += [pool.submit(_tiles_in_worker, frame_ref, tiles) for tiles in tile_groups]
+            return [location for future in futures for location in future.result()]
+        except BrokenProcessPool:
+            self._reset_pool()
+            raise
+
+    def encode_face_crops(self, frame_lease, locations: List[Tuple[int, int, int, int]]) -> np.ndarray:
+        """Encode the given face boxes of a leased shared-memory frame (blocks until done)"""
+        return self._run(_encode_in_worker, _slot_ref(frame_lease), locations)
+
+    def shutdown(self):
+        self._reset_pool()
@@ -0,0 +1,355 @@
+"""
+Shared per-camera recognition
+Each camera has one RecognitionWorker that runs detection + encoding on the
+newest frame and publishes the result with a sequence number and timestamp.
+/detect and /video_feed read the published result instead of running their
+own dlib pipelines, so the cost of recognition no longer scales with the
+number of open clients. A RecognitionScheduler runs the passes of every
+camera on a bounded thread pool, serving cameras with new frames in turn. An optional MotionGate skips passes
+while the scene is static and limits detection to the regions that moved,
+and an optional FaceTracker carries encodings across passes so only new or
+changed faces are re-encoded.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from face_tracker import FaceTracker
+from motion_gate import MotionGate, box_outside_roi, expand_roi
+
+
+class RecognitionResult:
+    """One published recognition pass over a camera frame"""
+
+    def __init__(self, seq: int, frame_seq: int, captured_at: float, locations: List[Tuple[int, int, int, int]],
+                 encodings: np.ndarray, results: List[dict], duration: float):
+        self.seq = seq
+        self.frame_seq = frame_seq
+        self.captured_at = captured_at
+        self.timestamp = datetime.fromtimestamp(captured_at).isoformat()
+        self.locations = locations
+        self.encodings = encodings
+        self.results = results
+        self.duration = duration
+
+        # Full-gallery labels, matched once on first request and shared by every reader
+        self._full_gallery_results: Optional[List[dict]] = None
+        self._full_gallery_lock = threading.Lock()
+
+    @property
+    def age(self) -> float:
+        """Seconds since the recognized frame was captured"""
+        return max(0.0, time.time() - self.captured_at)
+
+
+class RecognitionWorker:
+    """Runs face recognition over one camera's latest frames; passes are driven by a RecognitionScheduler"""
+
+    def __init__(self, camera_stream, face_detector, min_interval: float = 0.0, name: str = "",
+                 process_pool=None, motion_gate: Optional[MotionGate] = None,
+                 tracker: Optional[FaceTracker] = None,
+                 on_result: Optional[Callable[[RecognitionResult], None]] = None,
+                 camera_id: Optional[str] = None):
+        """
+        Initialize worker
+
+        Args:
+            camera_stream: Started CameraStreamFFmpeg
+            face_detector: FaceDetector used for matching (and detection/encoding without a pool)
+            min_interval: Minimum seconds between recognition passes (0 = as fast as frames allow)
+            name: Camera name for log messages
+            process_pool: Optional RecognitionProcessPool that detects and encodes in
+                worker processes (the camera must capture into shared memory)
+            motion_gate: Optional MotionGate; unchanged frames reuse the previous
+                result and faces outside the moving area are carried over
+            tracker: Optional FaceTracker; faces keep a track ID and their encoding
+                until they move, lose their identity or the encoding goes stale
+            on_result: Optional callback run with every published result (e.g. attendance voting)
+            camera_id: Camera whose session roster faces are matched against
+        """
+        self.camera_stream = camera_stream
+        self.face_detector = face_detector
+        self.process_pool = process_pool
+        self.motion_gate = motion_gate
+        self.tracker = tracker
+        self.on_result = on_result
+        self.camera_id = camera_id
+        self.min_interval = min_interval
+        self.name = name
+
+        self.condition = threading.Condition()
+        self.running = False
+
+        # Scheduling state (guarded by the scheduler's lock)
+        self.busy = False
+        self.processed_seq = 0
+        self.next_due = 0.0
+        # Set by readers that found the published result too old; forces the next pass past the motion gate
+        self.refresh_requested = False
+
+        # Latest published recognition result
+        self._result: Optional[RecognitionResult] = None
+        self._result_seq = 0
+
+    def start(self):
+        """Make the worker eligible for scheduling"""
+        self.running = True
+        print(f"🧠 Recognition worker started {self.name}".rstrip())
+
+    def stop(self):
+        """Stop scheduling passes and wake any waiting readers"""
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        print(f"🧠 Recognition worker stopped {self.name}".rstrip())
+
+    def due_in(self, now: float) -> Optional[float]:
+        """
+        Seconds until the worker may run a pass (0 = now)
+
+        Returns:
+            None while it is stopped, busy or has no frame newer than the last processed one
+        """
+        if not self.running or self.busy or self.camera_stream.detection_seq <= self.processed_seq:
+            return None
+        return max(0.0, self.next_due - now)
+
+    def run_once(self):
+        """Recognize the newest frame; frames arriving mid-pass are skipped"""
+        lease = self.camera_stream.wait_for_detection_lease(self.processed_seq, timeout=0)
+        if lease is None:
+            return
+        frame_seq, captured_at = lease.seq, lease.timestamp
+        self.processed_seq = frame_seq
+
+        started = time.monotonic()
+        previous = self.latest()
+        force_full = self.refresh_requested
+        self.refresh_requested = False
+        try:
+            # Ring slots stay pinned (zero-copy) for the duration of the pass
+            with lease:
+                roi = None
+                if self.motion_gate is not None:
+                    run, roi = self.motion_gate.check(lease.frame, started, force_full=force_full)
+                    if not run:
+                        # Nothing moved since the last pass: the published result still holds
+                        return
+                    if previous is None:
+                        roi = None
+
+                if self.camera_stream.has_detection_stream:
+                    # Detect on the small RGB frame; the full-res twin is only cropped for encoding
+                    full_lease = self.camera_stream.lease_frame(frame_seq)
+                    if full_lease is None:
+                        return
+                    with full_lease:
+                        locations, encodings, tracks, fresh = self._recognize(full_lease, lease, roi, previous, started)
+                else:
+                    locations, encodings, tracks, fresh = self._recognize(lease, None, roi, previous, started)
+
+            results = self.face_detector.match_faces(locations, encodings, camera_id=self.camera_id)
+            for result, is_fresh in zip(results, fresh):
+                result["fresh"] = is_fresh
+            if tracks is not None:
+                # Matching is one matrix product, so tracked faces are re-matched (roster changes apply at once)
+                for track, result, is_fresh in zip(tracks, results, fresh):
+                    self.tracker.record(track, result, is_fresh)
+                    result["track_id"] = track.id
+        except Exception as e:
+            print(f"Face detection error: {e}")
+            locations, encodings, results = [], np.zeros((0, 128)), []
+        duration = time.monotonic() - started
+        self.next_due = started + self.min_interval
+
+        result = RecognitionResult(
+            self._result_seq + 1, frame_seq, captured_at, locations, encodings, results, duration
+        )
+        # Listeners run before readers are woken, so a subscriber that sees this
+        # result also sees the attendance events it produced
+        if self.on_result is not None:
+            try:
+                self.on_result(result)
+            except Exception as e:
+                print(f"Recognition result callback error: {e}")
+
+        with self.condition:
+            self._result_seq = result.seq
+            self._result = result
+            self.condition.notify_all()
+
+    def _recognize(self, frame_lease, detection_lease, roi, previous: Optional[RecognitionResult], now: float):
+        """
+        Detect faces and encode the ones that need it
+
+        Returns:
+            (locations, encodings, tracks, fresh) for every face to publish; tracks
+            is None without a tracker, fresh flags faces encoded in this pass
+            (the rest reuse an earlier encoding and must not count as new evidence)
+        """
+        frame_shape = frame_lease.frame.shape
+        if roi is not None:
+            roi = expand_roi(roi, previous.locations, frame_shape)
+        locations = self._detect_face_locations(frame_lease, detection_lease, roi)
+
+        if self.tracker is None:
+            encodings = self._encode_face_crops(frame_lease, locations)
+            fresh = [True] * len(locations)
+            if roi is not None:
+                # Faces in regions that didn't move keep their previous boxes and encodings
+                kept = [
+                    index for index, location in enumerate(previous.locations)
+                    if box_outside_roi(location, roi, frame_shape)
+                ]
+                locations = [previous.locations[index] for index in kept] + list(locations)
+                encodings = np.concatenate([previous.encodings[kept].reshape(-1, 128), encodings])
+                fresh = [False] * len(kept) + fresh
+            return locations, encodings, None, fresh
+
+        # Only new, moved, weakly identified or stale tracks are encoded again
+        tracks = self.tracker.update(locations, roi, frame_shape)
+        stale = [track for track in tracks if self.tracker.needs_encoding(track, now)]
+        if stale:
+            encodings = self._encode_face_crops(frame_lease, [track.box for track in stale])
+            for track, encoding in zip(stale, encodings):
+                track.set_encoding(encoding, now)
+        visible = self.tracker.visible()
+        encodings = np.array([track.encoding for track in visible]).reshape(-1, 128)
+        encoded = {id(track) for track in stale}
+        fresh = [id(track) in encoded for track in visible]
+        return [track.box for track in visible], encodings, visible, fresh
+
+    def _detect_face_locations(self, frame_lease, detection_lease=None, roi=None):
+        if self.process_pool is not None:
+            if self.face_detector.tile_size > 0:
+                # Tiles are independent jobs, so one frame's detection spreads over every process;
+                # a batching backend gets them all in one job and one forward pass instead
+                tiles = self.face_detector.tile_regions(frame_lease.frame.shape, roi)
+                groups = [tiles] if self.face_detector.batched_detection else [[tile] for tile in tiles]
+                locations = self.process_pool.detect_tiled(frame_lease, detection_lease, roi, groups)
+                return self.face_detector.merge_detections(locations, tiled=True)
+            return self.process_pool.detect_face_locations(frame_lease, detection_lease, roi)
+        detection_frame = detection_lease.frame if detection_lease is not None else None
+        return self.face_detector.detect_face_locations(frame_lease.frame, detection_frame=detection_frame, roi=roi)
+
+    def _encode_face_crops(self, frame_lease, locations) -> np.ndarray:
+        if not locations:
+            return np.zeros((0, 128))
+        if self.process_pool is not None:
+            return self.process_pool.encode_face_crops(frame_lease, locations)
+        return self.face_detector.encode_face_crops(frame_lease.frame, locations)
+
+    def latest(self) -> Optional[RecognitionResult]:
+        """Most recently published recognition result"""
+        with self.condition:
+            return self._result
+
+    def wait_for_result(self, after_seq: int, timeout: float) -> Optional[RecognitionResult]:
+        """Block until a result newer than after_seq is published (or timeout)"""
+        with self.condition:
+            if self._result_seq <= after_seq and self.running:
+                self.condition.wait_for(lambda: self._result_seq > after_seq or not self.running, timeout=timeout)
+            return self._result
+
+    def request_refresh(self):
+        """Ask for a full pass on the next frame even if the scene looks static"""
+        self.refresh_requested = True
+
+    def results_for(self, result: RecognitionResult, use_full_gallery: bool = False) -> List[dict]:
+        """
+        Published results, or the same faces re-matched against the whole gallery
+
+        The full-gallery match is computed once per result (concurrent callers wait
+        for the first one) and shared; callers must not modify the returned dicts.
+        """
+        if not use_full_gallery:
+            return result.results
+        with result._full_gallery_lock:
+            if result._full_gallery_results is None:
+                full_results = self.face_detector.match_faces(result.locations, result.encodings, use_full_gallery=True)
+                for full, session in zip(full_results, result.results):
+                    full["fresh"] = session["fresh"]
+                    if "track_id" in session:
+                        full["track_id"] = session["track_id"]
+                result._full_gallery_results = full_results
+            return result._full_gallery_results
+
+
+class RecognitionScheduler:
+    """Bounded pool of recognition threads shared round-robin across cameras"""
+
+    def __init__(self, max_workers: int = 2):
+        """
+        Initialize scheduler
+
+        Args:
+            max_workers: Recognition threads shared by all cameras (RECOGNITION_WORKERS)
+        """
+        self.max_workers = max(1, max_workers)
+        self.workers: List[RecognitionWorker] = []
+        self.condition = threading.Condition()
+        self._next_index = 0
+        self._threads: List[threading.Thread] = []
+
+    def add(self, worker: RecognitionWorker):
+        # Published frames wake the scheduler threads; they never poll for new frames
+        worker.camera_stream.add_detection_listener(self.wake)
+        with self.condition:
+            self.workers.append(worker)
+            if not self._threads:
+                self._threads = [
+                    threading.Thread(target=self._loop, daemon=True) for _ in range(self.max_workers)
+                ]
+                for thread in self._threads:
+                    thread.start()
+                print(f"🧠 Recognition scheduler started with {self.max_workers} workers")
+            self.condition.notify_all()
+
+    def remove(self, worker: RecognitionWorker):
+        worker.camera_stream.remove_detection_listener(self.wake)
+        with self.condition:
+            if worker in self.workers:
+                self.workers.remove(worker)
+
+    def wake(self):
+        """Signal that a camera published a new frame"""
+        with self.condition:
+            self.condition.notify()
+
+    def _claim(self) -> Tuple[Optional[RecognitionWorker], Optional[float]]:
+        """
+        Next ready camera after the one served last (caller holds the lock)
+
+        Returns:
+            (worker, None), or (None, seconds until a throttled camera is due / None to wait for a frame)
+        """
+        now = time.monotonic()
+        count = len(self.workers)
+        wait = None
+        for offset in range(count):
+            index = (self._next_index + offset) % count
+            worker = self.workers[index]
+            due_in = worker.due_in(now)
+            if due_in == 0.0:
+                self._next_index = index + 1
+                worker.busy = True
+                return worker, None
+            if due_in is not None:
+                wait = due_in if wait is None else min(wait, due_in)
+        return None, wait
+
+    def _loop(self):
+        while True:
+            with self.condition:
+                worker, wait = self._claim()
+                if worker is None:
+                    # Woken by a published frame or a finished pass; only DETECTION_INTERVAL throttling times out
+                    self.condition.wait(timeout=wait)
+                    continue
+            try:
+                worker.run_once()
+            finally:
+                with self.condition:
+                    worker.busy = False
+                    self.condition.notify_all()
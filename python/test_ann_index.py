@@ -0,0 +1,102 @@
+"""
+Tests for the IVF index: recall against exact search and row bookkeeping
+Run from python/: python -m pytest -q
+"""
+import numpy as np
+import pytest
+from ann_index import IVFIndex
+
+
+def clustered_gallery(rows=2000, clusters=40, seed=0):
+    """Face-like data: tight groups of 128-d vectors around random centres"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0, 0.3, size=(clusters, 128))
+    labels = rng.integers(0, clusters, size=rows)
+    return (centres[labels] + rng.normal(0, 0.05, size=(rows, 128))).astype(np.float32)
+
+
+def exact_search(matrix, queries, k=1):
+    distances = np.linalg.norm(matrix[None, :, :] - queries[:, None, :], axis=2)
+    rows = np.argsort(distances, axis=1)[:, :k]
+    return rows, np.take_along_axis(distances, rows, axis=1)
+
+
+@pytest.fixture
+def gallery():
+    matrix = clustered_gallery()
+    index = IVFIndex(nprobe=8)
+    index.build(matrix)
+    return matrix, index
+
+
+def test_recall_matches_exact_search(gallery):
+    matrix, index = gallery
+    rng = np.random.default_rng(1)
+    queries = (matrix[rng.choice(len(matrix), 200)] + rng.normal(0, 0.02, size=(200, 128))).astype(np.float32)
+
+    exact_rows, exact_distances = exact_search(matrix, queries, k=5)
+    rows, distances = index.search(queries, k=5)
+
+    recall = np.mean(rows[:, 0] == exact_rows[:, 0])
+    assert recall >= 0.95
+    # Distances come back sorted and agree with the exact ones wherever the rows do
+    assert np.all(np.diff(distances, axis=1) >= 0)
+    same = rows == exact_rows
+    np.testing.assert_allclose(distances[same], exact_distances[same], rtol=1e-3, atol=1e-3)
+
+
+def test_probing_every_list_is_exact(gallery):
+    matrix, index = gallery
+    queries = matrix[:50] + np.float32(0.01)
+    rows, _ = index.search(queries, k=3, nprobe=len(index.centroids))
+    exact_rows, _ = exact_search(matrix, queries, k=3)
+    np.testing.assert_array_equal(rows, exact_rows)
+
+
+def test_k_larger_than_candidates_pads_with_missing():
+    matrix = clustered_gallery(rows=4, clusters=2)
+    index = IVFIndex(nlist=2, nprobe=1)
+    index.build(matrix)
+    rows, distances = index.search(matrix[:1], k=10)
+    found = rows[0] >= 0
+    assert found.sum() <= 4
+    assert np.all(np.isinf(distances[0][~found]))
+
+
+def test_update_inserts_new_row(gallery):
+    matrix, index = gallery
+    vector = matrix[0] + np.float32(0.001)
+    row = len(matrix)
+    index.update(row, vector)
+    rows, _ = index.search(vector[None, :], k=1, nprobe=len(index.centroids))
+    assert rows[0, 0] == row
+
+
+def test_removed_row_is_never_returned(gallery):
+    matrix, index = gallery
+    index.remove(7)
+    rows, _ = index.search(matrix[7:8], k=5, nprobe=len(index.centroids))
+    assert 7 not in rows[0]
+    assert sum(7 in list_rows for list_rows in index.lists) == 0
+    assert index.assignments[7] == -1
+
+
+def test_swap_remove_relabel_keeps_rows_consistent(gallery):
+    matrix, index = gallery
+    # The gallery deletes row 3 by moving its last row into the hole
+    last = len(matrix) - 1
+    index.remove(3)
+    index.relabel(last, 3)
+    gallery_after = matrix.copy()
+    gallery_after[3] = matrix[last]
+    gallery_after = gallery_after[:last]
+
+    rows, _ = index.search(matrix[last:last + 1], k=1, nprobe=len(index.centroids))
+    assert rows[0, 0] == 3
+    assert index.assignments[last] == -1
+
+    # Every list row points at the vector stored alongside it
+    all_rows = np.concatenate(index.lists)
+    assert sorted(all_rows.tolist()) == list(range(last))
+    for list_rows, vectors in zip(index.lists, index.list_vectors):
+        np.testing.assert_array_equal(vectors, gallery_after[list_rows])
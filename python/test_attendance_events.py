@@ -0,0 +1,134 @@
+"""
+Tests for server-side attendance confirmation (AttendanceVoter)
+Run from python/: python -m pytest -q
+"""
+import numpy as np
+import pytest
+from attendance_events import AttendanceVoter
+from recognition_worker import RecognitionResult
+
+
+class Passes:
+    """Builds consecutive RecognitionResults for one camera"""
+
+    def __init__(self, start=1000.0):
+        self.seq = 0
+        self.now = start
+
+    def next(self, faces, dt=1.0):
+        self.seq += 1
+        self.now += dt
+        results = [
+            {"student_id": sid, "name": sid.upper() if sid else "Unknown", "confidence": confidence,
+             "fresh": fresh, "bbox": (0, 10, 10, 0)}
+            for sid, confidence, fresh in faces
+        ]
+        return RecognitionResult(self.seq, self.seq, self.now, [], np.zeros((0, 128)), results, 0.0)
+
+
+def match(sid, confidence=0.9, fresh=True):
+    return sid, confidence, fresh
+
+
+@pytest.fixture
+def voter():
+    return AttendanceVoter(min_hits=3, window=10.0, min_confidence=0.5)
+
+
+def test_confirms_after_min_hits_in_window(voter):
+    session = voter.start("room1")
+    passes = Passes()
+    for _ in range(2):
+        voter.observe("room1", passes.next([match("s1")]))
+    assert session.events == []
+    voter.observe("room1", passes.next([match("s1", 0.6)]))
+
+    [event] = session.events
+    assert event["seq"] == 1
+    assert event["student_id"] == "s1"
+    assert event["hits"] == 3
+    assert event["camera_id"] == "room1"
+    assert event["confidence"] == pytest.approx((0.9 + 0.9 + 0.6) / 3)
+
+
+def test_hits_outside_window_expire(voter):
+    session = voter.start("room1")
+    passes = Passes()
+    voter.observe("room1", passes.next([match("s1")]))
+    voter.observe("room1", passes.next([match("s1")], dt=6.0))
+    # The first hit is now more than 10s old
+    voter.observe("room1", passes.next([match("s1")], dt=6.0))
+    assert session.events == []
+    voter.observe("room1", passes.next([match("s1")], dt=1.0))
+    assert len(session.events) == 1
+
+
+def test_confirmed_once_per_session(voter):
+    session = voter.start("room1")
+    passes = Passes()
+    for _ in range(6):
+        voter.observe("room1", passes.next([match("s1")]))
+    assert [event["student_id"] for event in session.events] == ["s1"]
+
+
+def test_low_confidence_and_unknown_faces_do_not_vote(voter):
+    session = voter.start("room1", min_confidence=0.8)
+    passes = Passes()
+    for _ in range(5):
+        voter.observe("room1", passes.next([match("s1", 0.7), match(None, 0.99)]))
+    assert session.events == []
+    assert session.evidence == {}
+
+
+def test_carried_over_encodings_do_not_vote(voter):
+    session = voter.start("room1")
+    passes = Passes()
+    voter.observe("room1", passes.next([match("s1")]))
+    for _ in range(5):
+        voter.observe("room1", passes.next([match("s1", fresh=False)]))
+    assert session.events == []
+    assert len(session.evidence["s1"]) == 1
+
+
+def test_pass_votes_once_per_student(voter):
+    session = voter.start("room1")
+    passes = Passes()
+    # Two boxes matched to the same student in one pass, then the same pass re-published
+    result = passes.next([match("s1", 0.7), match("s1", 0.95)])
+    voter.observe("room1", result)
+    voter.observe("room1", result)
+    assert [hit[1] for hit in session.evidence["s1"]] == [0.95]
+
+
+def test_sessions_are_per_camera(voter):
+    room1, room2 = voter.start("room1"), voter.start("room2")
+    passes = Passes()
+    for _ in range(3):
+        voter.observe("room1", passes.next([match("s1")]))
+    voter.observe("room3", passes.next([match("s1")]))  # No session: ignored
+    assert len(room1.events) == 1
+    assert room2.events == []
+
+
+def test_restart_closes_previous_session(voter):
+    first = voter.start("room1")
+    second = voter.start("room1")
+    assert first.closed and not second.closed
+    assert voter.session_for("room1") is second
+    assert first.wait_for_events(0, timeout=0.01) == ([], True)
+
+    voter.clear("room1")
+    assert second.closed
+    assert voter.session_for("room1") is None
+
+
+def test_wait_for_events_returns_new_events(voter):
+    session = voter.start("room1")
+    passes = Passes()
+    assert session.wait_for_events(0, timeout=0.01) == ([], False)
+    for _ in range(3):
+        voter.observe("room1", passes.next([match("s1"), match("s2")]))
+    events, closed = session.wait_for_events(0, timeout=0.01)
+    assert [event["seq"] for event in events] == [1, 2]
+    assert session.wait_for_events(1, timeout=0.01)[0] == events[1:]
+    assert not closed
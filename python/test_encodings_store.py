@@ -0,0 +1,114 @@
+"""
+Tests for the encodings store: checkpoints, journal replay and torn-tail recovery
+Run from python/: python -m pytest -q
+"""
+import os
+import numpy as np
+import pytest
+from encodings_store import ENCODING_DIM, EncodingsStore
+
+
+def vector(value):
+    return np.full(ENCODING_DIM, value, dtype=np.float32)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EncodingsStore(str(tmp_path / "known_faces"))
+    yield store
+    store.close()
+
+
+def reopen(store):
+    """A fresh store over the same files, as after a restart"""
+    store.close()
+    reopened = EncodingsStore(store.base_path)
+    if reopened.exists():
+        reopened.load()
+    return reopened
+
+
+def test_checkpoint_round_trip(store):
+    matrix = np.stack([vector(0.1), vector(0.2)])
+    store.save(matrix, ["s1", "s2"], ["One", "Two"])
+
+    loaded, ids, names = reopen(store).load()
+    np.testing.assert_array_equal(loaded, matrix)
+    assert ids == ["s1", "s2"]
+    assert names == ["One", "Two"]
+    assert not loaded.flags.writeable
+
+
+def test_replay_without_checkpoint(store):
+    store.append("upsert", "s1", "One", vector(0.1))
+    store.append_many([("upsert", "s2", "Two", vector(0.2)), ("delete", "s1", None, None)])
+
+    records = reopen(store).replay_journal()
+    assert [(r.seq, r.op, r.student_id, r.name) for r in records] == [
+        (1, "upsert", "s1", "One"), (2, "upsert", "s2", "Two"), (3, "delete", "s1", None)
+    ]
+    np.testing.assert_array_equal(records[1].vector, vector(0.2))
+    assert records[2].vector is None
+
+
+def test_replay_skips_records_folded_into_checkpoint(store):
+    store.append("upsert", "s1", "One", vector(0.1))
+    store.save(vector(0.1)[None, :], ["s1"], ["One"])
+    store.append("upsert", "s2", "Two", vector(0.2))
+
+    reopened = reopen(store)
+    records = reopened.replay_journal()
+    assert [(r.seq, r.student_id) for r in records] == [(2, "s2")]
+    assert reopened.pending_records == 1
+    # New records continue the sequence instead of reusing folded numbers
+    assert reopened.append("delete", "s2") == 3
+
+
+def test_checkpoint_keeps_records_appended_after_snapshot(store):
+    store.append("upsert", "s1", "One", vector(0.1))
+    snapshot_seq = store.journal_seq
+    store.append("upsert", "s2", "Two", vector(0.2))
+    store.save(vector(0.1)[None, :], ["s1"], ["One"], journal_seq=snapshot_seq)
+
+    records = reopen(store).replay_journal()
+    assert [r.student_id for r in records] == ["s2"]
+
+
+@pytest.mark.parametrize("damage", ["torn", "corrupt"])
+def test_damaged_tail_is_truncated(store, damage):
+    store.append("upsert", "s1", "One", vector(0.1))
+    store.append("upsert", "s2", "Two", vector(0.2))
+    valid_length = os.path.getsize(store.journal_path)
+    store.append("upsert", "s3", "Three", vector(0.3))
+    store.close()
+
+    with open(store.journal_path, 'r+b') as f:
+        if damage == "torn":
+            # Crash mid-append: only part of the last record reached the disk
+            f.truncate(valid_length + 20)
+        else:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 0xFF]))
+
+    reopened = reopen(store)
+    records = reopened.replay_journal()
+    assert [r.student_id for r in records] == ["s1", "s2"]
+    assert os.path.getsize(store.journal_path) == valid_length
+
+    # Appends continue after the last valid record and replay cleanly
+    reopened.append("upsert", "s4", "Four", vector(0.4))
+    assert [(r.seq, r.student_id) for r in reopen(reopened).replay_journal()] == [(1, "s1"), (2, "s2"), (3, "s4")]
+
+
+def test_read_only_replay_leaves_tail_alone(store):
+    store.append("upsert", "s1", "One", vector(0.1))
+    store.close()
+    with open(store.journal_path, 'ab') as f:
+        f.write(b"FJR1partial")
+    size = os.path.getsize(store.journal_path)
+
+    records = EncodingsStore(store.base_path).replay_journal(truncate=False)
+    assert [r.student_id for r in records] == ["s1"]
+    assert os.path.getsize(store.journal_path) == size
@@ -0,0 +1,78 @@
+"""
+Tests for tiled detection helpers: tile layout and cross-tile duplicate suppression
+Run from python/: python -m pytest -q
+"""
+import pytest
+
+pytest.importorskip("face_recognition")
+from face_detector import FaceDetector, non_max_suppression
+
+
+def tiler(tile_size, tile_overlap=0.25):
+    """FaceDetector with only the tiling settings (no gallery, no model)"""
+    detector = FaceDetector.__new__(FaceDetector)
+    detector.tile_size = tile_size
+    detector.tile_overlap = tile_overlap
+    return detector
+
+
+def covered(tiles, height, width):
+    mask = [[False] * width for _ in range(height)]
+    for top, right, bottom, left in tiles:
+        for y in range(top, bottom):
+            mask[y][left:right] = [True] * (right - left)
+    return all(all(row) for row in mask)
+
+
+def test_nms_keeps_disjoint_boxes():
+    boxes = [(0, 50, 50, 0), (0, 200, 50, 150), (100, 50, 150, 0)]
+    assert sorted(non_max_suppression(boxes)) == sorted(boxes)
+
+
+def test_nms_keeps_largest_of_overlapping_group():
+    big = (100, 200, 200, 100)
+    shifted = (105, 203, 198, 108)
+    assert non_max_suppression([shifted, big]) == [big]
+
+
+def test_nms_drops_partial_box_cut_at_tile_border():
+    # Half a face seen by one tile, the whole face by the neighbouring tile:
+    # IoU is only 0.5 but the partial box lies entirely inside the full one
+    full = (100, 200, 200, 100)
+    partial = (100, 150, 200, 100)
+    assert non_max_suppression([partial, full], threshold=0.5) == [full]
+
+
+def test_nms_threshold_controls_suppression():
+    a = (0, 100, 100, 0)
+    b = (0, 160, 100, 60)  # 40% of either box overlaps
+    assert len(non_max_suppression([a, b], threshold=0.5)) == 2
+    assert len(non_max_suppression([a, b], threshold=0.3)) == 1
+
+
+def test_nms_passes_through_short_lists():
+    assert non_max_suppression([]) == []
+    assert non_max_suppression([(1, 2, 3, 0)]) == [(1, 2, 3, 0)]
+
+
+def test_tiles_cover_frame_with_overlap():
+    tiles = tiler(400).tile_regions((1080, 1920, 3))
+    assert covered(tiles, 1080, 1920)
+    assert all(bottom - top <= 400 and right - left <= 400 for top, right, bottom, left in tiles)
+    # Neighbouring tiles share at least the configured overlap
+    lefts = sorted({left for _, _, _, left in tiles})
+    assert all(b - a <= 300 for a, b in zip(lefts, lefts[1:]))
+    # The last column/row is aligned to the far edge
+    assert max(right for _, right, _, _ in tiles) == 1920
+    assert max(bottom for _, _, bottom, _ in tiles) == 1080
+
+
+def test_single_tile_when_frame_is_smaller():
+    assert tiler(800).tile_regions((480, 640, 3)) == [(0, 640, 480, 0)]
+
+
+def test_tiles_limited_to_roi():
+    tiles = tiler(200).tile_regions((400, 800, 3), roi=(0.0, 0.5, 0.5, 0.0))
+    assert all(0 <= top and bottom <= 200 and 0 <= left and right <= 400 for top, right, bottom, left in tiles)
+    assert covered(tiles, 200, 400)
+    assert min(left for _, _, _, left in tiles) == 0
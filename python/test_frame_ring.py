@@ -0,0 +1,144 @@
+"""
+Tests for the frame ring: leases, refcounts and slot reuse
+Run from python/: python -m pytest -q
+"""
+import threading
+from multiprocessing import shared_memory
+import numpy as np
+import pytest
+from frame_ring import FrameRing
+
+SHAPE = (4, 6, 3)
+
+
+def write_frame(ring, value, timestamp=0.0, seq=None):
+    """Capture-thread step: claim a slot, fill it, publish it"""
+    slot = ring.writable_slot()
+    ring.write_view(slot)[:] = bytes([value]) * ring.frame_bytes
+    ring.publish(slot, timestamp, seq=seq)
+    return slot
+
+
+@pytest.fixture
+def ring():
+    return FrameRing(SHAPE, slots=3)
+
+
+def test_no_lease_before_first_frame(ring):
+    assert ring.lease_latest() is None
+    assert ring.wait_for_lease(0, timeout=0.01) is None
+
+
+def test_lease_is_zero_copy_and_read_only(ring):
+    slot = write_frame(ring, 7, timestamp=12.5)
+    with ring.lease_latest() as lease:
+        assert lease.seq == 1
+        assert lease.timestamp == 12.5
+        assert np.all(lease.frame == 7)
+        assert np.shares_memory(lease.frame, ring.buffers[slot])
+        with pytest.raises(ValueError):
+            lease.frame[0, 0, 0] = 1
+
+
+def test_refcounts_follow_leases(ring):
+    slot = write_frame(ring, 1)
+    # The ring itself holds the latest slot
+    assert ring.refcounts[slot] == 1
+    first, second = ring.lease_latest(), ring.lease_latest()
+    assert ring.refcounts[slot] == 3
+    first.release()
+    first.release()  # Idempotent
+    assert ring.refcounts[slot] == 2
+    second.release()
+    write_frame(ring, 2)
+    assert ring.refcounts[slot] == 0
+
+
+def test_leased_slot_is_not_overwritten(ring):
+    write_frame(ring, 1)
+    lease = ring.lease_latest()
+    # Enough frames to cycle the ring several times over
+    for value in range(2, 12):
+        slot = write_frame(ring, value)
+        assert slot != lease.index
+    assert np.all(lease.frame == 1)
+    assert lease.seq == 1
+    lease.release()
+    # Once released it is the oldest free slot again
+    assert ring.writable_slot() == lease.index
+
+
+def test_unleased_slots_are_reused_oldest_first(ring):
+    slots = [write_frame(ring, value) for value in range(3)]
+    assert write_frame(ring, 3) == slots[0]
+    assert write_frame(ring, 4) == slots[1]
+
+
+def test_frames_dropped_when_every_slot_is_leased(ring):
+    leases = []
+    for value in range(3):
+        write_frame(ring, value)
+        leases.append(ring.lease_latest())
+    slot = ring.writable_slot()
+    assert slot == -1
+    # The frame is read into scratch and dropped; the latest frame is unchanged
+    ring.write_view(slot)[:] = bytes([99]) * ring.frame_bytes
+    ring.publish(slot, 0.0)
+    assert ring.dropped == 1
+    with ring.lease_latest() as lease:
+        assert lease.seq == 3
+        assert np.all(lease.frame == 2)
+    for lease in leases:
+        lease.release()
+    assert ring.writable_slot() >= 0
+
+
+def test_lease_seq_pairs_frames_and_misses_overwritten(ring):
+    for seq in (10, 11, 12):
+        write_frame(ring, seq, seq=seq)
+    with ring.lease_seq(11, timeout=0.01) as lease:
+        assert np.all(lease.frame == 11)
+    write_frame(ring, 13, seq=13)
+    assert ring.lease_seq(10, timeout=0.01) is None
+
+
+def test_wait_for_lease_wakes_on_publish_and_close(ring):
+    write_frame(ring, 1)
+    leased = []
+    waiter = threading.Thread(target=lambda: leased.append(ring.wait_for_lease(1, timeout=5)))
+    waiter.start()
+    write_frame(ring, 2)
+    waiter.join(timeout=5)
+    assert leased[0].seq == 2
+    leased[0].release()
+
+    closed = []
+    waiter = threading.Thread(target=lambda: closed.append(ring.wait_for_lease(2, timeout=5)))
+    waiter.start()
+    ring.close()
+    waiter.join(timeout=5)
+    assert closed == [None]
+
+
+def test_listeners_run_after_publish(ring):
+    seen = []
+    listener = lambda: seen.append(ring.seq)
+    ring.add_listener(listener)
+    write_frame(ring, 1)
+    ring.publish(-1, 0.0)  # Dropped frames don't notify
+    ring.remove_listener(listener)
+    write_frame(ring, 2)
+    assert seen == [1]
+
+
+def test_shared_memory_slots():
+    ring = FrameRing(SHAPE, slots=2, shared=True)
+    try:
+        slot = write_frame(ring, 5)
+        block = shared_memory.SharedMemory(name=ring.shared_name(slot))
+        try:
+            assert np.all(np.ndarray(SHAPE, dtype=np.uint8, buffer=block.buf) == 5)
+        finally:
+            block.close()
+    finally:
+        ring.free_shared_memory()
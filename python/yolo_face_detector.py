@@ -1,10 +1,13 @@
 """
 YOLO-based face detector for improved detection quality
-Supports CPU and GPU modes via device selection
+Supports CPU and GPU modes via device selection, batched inference over
+several images, and a batcher that merges concurrent single-image calls
 """
 import cv2
 import numpy as np
-from typing import List, Tuple
+import threading
+import time
+from typing import List, Optional, Tuple
 import os
 
 
@@ -45,42 +48,62 @@ class YOLOFaceDetector:
         Detect faces in frame
         
         Args:
-            frame: OpenCV BGR image
+            frame: RGB image (as FaceDetector passes them)
             conf_threshold: Minimum confidence for detection
         
         Returns:
             List of face bounding boxes as (top, right, bottom, left) tuples
             matching face_recognition format
         """
-        # Run YOLO inference
-        results = self.model(frame, conf=conf_threshold, verbose=False)
+        return self.detect_batch([frame], conf_threshold)[0]
+    
+    def detect_batch(self, frames: List[np.ndarray], conf_threshold: float = 0.5,
+                     batch_size: int = 16) -> List[List[Tuple[int, int, int, int]]]:
+        """
+        Detect faces in several images (frames of different cameras, tiles of one frame)
+        with one batched forward pass per batch_size images
         
+        Args:
+            frames: RGB images, which may differ in size
+            conf_threshold: Minimum confidence for detection
+            batch_size: Maximum images per forward pass
+        
+        Returns:
+            One list of (top, right, bottom, left) boxes per input image
+        """
         face_locations = []
+        for start in range(0, len(frames), batch_size):
+            # Ultralytics treats numpy images as OpenCV BGR
+            chunk = [cv2.cvtColor(frame, cv2.COLOR_RGB2BGR) for frame in frames[start:start + batch_size]]
+            results = self.model(chunk, conf=conf_threshold, verbose=False)
+            face_locations.extend(self._boxes_to_locations(results))
+        return face_locations
+    
+    @staticmethod
+    def _boxes_to_locations(results) -> List[List[Tuple[int, int, int, int]]]:
+        """Convert a batch of results with one device-to-host transfer and vectorized reordering"""
+        counts = [len(result.boxes) if result.boxes is not None else 0 for result in results]
+        if sum(counts) == 0:
+            return [[] for _ in results]
         
-        # Extract face bounding boxes
-        if len(results) > 0 and results[0].boxes is not None:
-            boxes = results[0].boxes
-            
-            for box in boxes:
-                # Get xyxy format
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                
-                # Convert to (top, right, bottom, left) format to match face_recognition
-                top = int(y1)
-                right = int(x2)
-                bottom = int(y2)
-                left = int(x1)
-                
-                face_locations.append((top, right, bottom, left))
+        import torch
+        xyxy = torch.cat([result.boxes.xyxy for result in results if result.boxes is not None]).cpu().numpy()
+        # xyxy -> (top, right, bottom, left) = (y1, x2, y2, x1) to match face_recognition
+        locations = xyxy[:, [1, 2, 3, 0]].astype(np.int32).tolist()
         
-        return face_locations
+        per_image = []
+        offset = 0
+        for count in counts:
+            per_image.append([tuple(location) for location in locations[offset:offset + count]])
+            offset += count
+        return per_image
     
     def detect_largest(self, frame: np.ndarray, conf_threshold: float = 0.5) -> Tuple[int, int, int, int]:
         """
         Detect and return the largest face in frame
         
         Args:
-            frame: OpenCV BGR image
+            frame: RGB image
             conf_threshold: Minimum confidence for detection
         
         Returns:
@@ -98,3 +121,76 @@ class YOLOFaceDetector:
         )
         
         return largest_face
+
+
+class _PendingDetection:
+    __slots__ = ("image", "result", "error", "done")
+
+    def __init__(self, image: np.ndarray):
+        self.image = image
+        self.result: List[Tuple[int, int, int, int]] = []
+        self.error: Optional[Exception] = None
+        self.done = False
+
+
+class DetectionBatcher:
+    """
+    Coalesces concurrent single-image detect calls into batched forward passes
+    
+    Recognition threads of different cameras call detect() independently; the
+    first caller waits up to max_wait for others to join and then runs one
+    detect_batch for everything pending, handing each caller its own boxes.
+    """
+    
+    def __init__(self, detector: YOLOFaceDetector, max_batch: int = 16, max_wait: float = 0.005):
+        """
+        Initialize batcher
+        
+        Args:
+            detector: Loaded YOLOFaceDetector
+            max_batch: Maximum images per forward pass
+            max_wait: Seconds the batch leader waits for other callers to join
+        """
+        self.detector = detector
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.condition = threading.Condition()
+        self.pending: List[_PendingDetection] = []
+        self.busy = False
+    
+    def detect(self, image: np.ndarray, conf_threshold: float = 0.5) -> List[Tuple[int, int, int, int]]:
+        slot = _PendingDetection(image)
+        with self.condition:
+            self.pending.append(slot)
+            self.condition.notify_all()
+            while not slot.done:
+                if self.busy:
+                    self.condition.wait()
+                    continue
+                
+                # Lead one batch: let concurrent callers join, then run them together
+                self.busy = True
+                deadline = time.monotonic() + self.max_wait
+                while len(self.pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+                
+                self.condition.release()
+                try:
+                    results = self.detector.detect_batch([item.image for item in batch], conf_threshold)
+                    error = None
+                except Exception as e:
+                    results, error = [[] for _ in batch], e
+                finally:
+                    self.condition.acquire()
+                for item, result in zip(batch, results):
+                    item.result, item.error, item.done = result, error, True
+                self.busy = False
+                self.condition.notify_all()
+        
+        if slot.error is not None:
+            raise slot.error
+        return slot.result
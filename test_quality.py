@@ -3,8 +3,9 @@
 Test script to verify face recognition quality improvements
 Run this after the system is started to see the improvements in action
 """
+import os
+import sys
 import requests
-import json
 
 BASE_URL = "http://localhost:5000"
 
@@ -20,23 +21,28 @@ def test_health():
         return False
 
 def get_encoding_stats():
-    """Get current encoding statistics"""
+    """Get current encoding statistics (checkpoint plus journaled enrollments)"""
     print("\n📊 Current enrollment statistics...")
-    # This would need to be exposed via API or check the pickle file
-    import pickle
-    import os
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "python"))
+    from encodings_store import EncodingsStore
     
-    encodings_path = "python/encodings/known_faces.pkl"
-    if os.path.exists(encodings_path):
-        with open(encodings_path, 'rb') as f:
-            data = pickle.load(f)
-            num_encodings = len(data.get("encodings", []))
-            num_ids = len(data.get("ids", []))
-            print(f"✅ Total enrolled: {num_ids} students ({num_encodings} encodings)")
-            return num_ids
-    else:
+    store = EncodingsStore("python/encodings/known_faces")
+    # Enrollments since the last checkpoint (or before the first one) live only in the journal
+    ids = store.load()[1] if store.exists() else []
+    records = store.replay_journal(truncate=False)
+    if not store.exists() and not records:
         print("⚠️ No encodings file found")
         return 0
+    
+    enrolled = set(ids)
+    for record in records:
+        if record.op == "upsert":
+            enrolled.add(record.student_id)
+        elif record.op == "delete":
+            enrolled.discard(record.student_id)
+    print(f"✅ Total enrolled: {len(enrolled)} students "
+          f"({len(ids)} checkpointed, {len(records)} journaled changes)")
+    return len(enrolled)
 
 def test_detection():
     """Test face detection endpoint"""